@@ -0,0 +1,77 @@
+import sys
+import tracemalloc
+from nuclear.materials import Fuel, Waste, Auxiliary
+from nuclear.reactor import ReactorSimulator
+
+
+# the material classes as they were before __slots__, storing their attributes in a per-instance __dict__
+class DictMaterial:
+    def __init__(self, name, energy):
+        self._name = name
+        self._energy = energy
+        self._products = []
+        self._auxiliary = None
+
+
+class DictFuel(DictMaterial):
+    def __init__(self, name, energy, price):
+        super().__init__(name, energy)
+        self._price = price
+
+
+class DictWaste(DictMaterial):
+    def __init__(self, name, energy, disposal_cost):
+        super().__init__(name, energy)
+        self._disposal_cost = disposal_cost
+
+
+class DictAuxiliary(DictMaterial):
+    def __init__(self, name):
+        super().__init__(name, 0)
+
+
+def load(count, fuel, waste, auxiliary):
+    materials = {}
+    for i in range(count):
+        name = "Material{}".format(i)
+        if i % 3 == 0:
+            materials[name] = fuel(name, 1.0, 1)
+        elif i % 3 == 1:
+            materials[name] = waste(name, 1.0, 1)
+        else:
+            materials[name] = auxiliary(name)
+    return materials
+
+
+def measure(label, count, builder):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    materials = builder(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("{:<10} {:10.1f} bytes/material".format(label, (after - before) / count))
+    return materials
+
+
+def load_simulator(count):
+    rs = ReactorSimulator()
+    for i in range(count):
+        name = "Material{}".format(i)
+        if i % 3 == 0:
+            rs.add_fuel(name, 1.0, 1)
+        elif i % 3 == 1:
+            rs.add_waste(name, 1.0, 1)
+        else:
+            rs.add_auxiliary(name)
+    return rs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    measure("__dict__", count, lambda n: load(n, DictFuel, DictWaste, DictAuxiliary))
+    measure("__slots__", count, lambda n: load(n, Fuel, Waste, Auxiliary))
+    measure("simulator", count, load_simulator)
+
+
+if __name__ == "__main__":
+    main()
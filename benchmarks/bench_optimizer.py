@@ -0,0 +1,37 @@
+import random
+import sys
+import time
+from nuclear.reactor import ReactorSimulator
+
+
+def build_catalogue(fuels, seed=0):
+    rng = random.Random(seed)
+    rs = ReactorSimulator()
+    for i in range(10):
+        rs.add_auxiliary("Aux{}".format(i))
+    for i in range(fuels):
+        rs.add_fuel("Fuel{}".format(i), rng.uniform(1, 20), rng.randint(1, 100))
+        fuel = rs.get_material("Fuel{}".format(i))
+        for j in range(rng.randint(1, 4)):
+            rs.add_waste("Waste{}_{}".format(i, j), rng.uniform(0, 2), rng.randint(1, 50))
+            fuel.add_product(rs.get_material("Waste{}_{}".format(i, j)), rng.uniform(0.1, 0.5))
+        if rng.random() < 0.5:
+            fuel.set_auxiliary(rs.get_material("Aux{}".format(rng.randrange(10))))
+    return rs
+
+
+def main():
+    fuels = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rs = build_catalogue(fuels)
+    availability = {"Fuel{}".format(i): 10.0 for i in range(fuels)}
+    auxiliary = {"Aux{}".format(i) for i in range(5)}
+    for label, limits in (("unlimited", None), ("10 g per fuel", availability)):
+        for run in ("cold", "warm"):
+            start = time.perf_counter()
+            mix = rs.optimize_fuel_mix(fuels * 20, auxiliary, limits)
+            elapsed = time.perf_counter() - start
+            print("{:<14} {:<5} {:6d} fuels used {:10.3f} ms".format(label, run, len(mix), elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+from benchmarks.generators import forest
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print("{:<44} {:10.3f} s".format(label, elapsed))
+    return elapsed
+
+
+def started(catalogue, trees, workers):
+    # simulator whose process pool is running, its workers having mapped an older version
+    rs = catalogue.build()
+    rs.simulate_many([(tree, 1) for tree in trees], workers)
+    rs.add_fuel("Unused", 1, 1)
+    return rs
+
+
+def main():
+    # Cold queries (no cached yields) on a root fuel with one large binary tree per worker. The
+    # parallel times include the snapshot of the new version, not the start of the processes.
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 400000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    catalogue = forest(nodes, trees=workers, branching=2)
+    trees = [product for material, product, _ in catalogue.products if material == catalogue.root]
+    jobs = [(tree, quantity) for quantity in range(1, 26) for tree in trees]
+    print("{} materials, {} trees, {} workers, {} jobs".format(len(catalogue.materials), len(trees), workers,
+                                                              len(jobs)))
+
+    rs = catalogue.build()
+    serial = timed("simulate_many, workers=1", lambda: rs.simulate_many(jobs, workers=1))
+    rs = started(catalogue, trees, workers)
+    parallel = timed("simulate_many", lambda: rs.simulate_many(jobs, workers))
+    timed("simulate_many, same version again", lambda: rs.simulate_many(jobs, workers))
+    rs.shutdown_workers()
+    print("{:<44} {:10.2f}x".format("speedup", serial / parallel))
+
+    rs = catalogue.build()
+    serial = timed("simulate_reaction", lambda: rs.simulate_reaction(catalogue.root, 10))
+    rs = started(catalogue, trees, workers)
+    parallel = timed("simulate_reaction_parallel", lambda: rs.simulate_reaction_parallel(catalogue.root, 10, workers))
+    timed("simulate_reaction_parallel, same version again",
+          lambda: rs.simulate_reaction_parallel(catalogue.root, 10, workers))
+    rs.shutdown_workers()
+    print("{:<44} {:10.2f}x".format("speedup", serial / parallel))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import sys
+import time
+from benchmarks.generators import chain, wide
+from nuclear.reactor import ReactorSimulator
+
+
+def timed(label, function, repeat):
+    start = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            function()
+    except RecursionError:
+        print("{:<32} RecursionError".format(label))
+        return
+    elapsed = (time.perf_counter() - start) / repeat
+    print("{:<32} {:10.3f} ms".format(label, elapsed * 1000))
+
+
+def compare(name, catalogue, repeat):
+    print("--- {} ---".format(name))
+    rs = catalogue.build()
+    root = catalogue.root
+    material = rs.get_material(root)
+    timed("recursive_sim", lambda: ReactorSimulator.recursive_sim(material, 10, []), repeat)
+    timed("iterative_sim", lambda: ReactorSimulator.iterative_sim(material, 10, []), repeat)
+    timed("simulate_reaction (cold cache)", lambda: rs.simulate_reaction(root, 10), 1)
+    timed("simulate_reaction (warm cache)", lambda: rs.simulate_reaction(root, 10), repeat)
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    compare("chain of {} levels".format(depth), chain(depth), 5)
+    compare("fan-out of {} products".format(depth), wide(depth), 5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import random
+from typing import List, NamedTuple, Tuple
+from nuclear.reactor import ReactorSimulator
+
+
+class Catalogue(NamedTuple):
+    # synthetic material graph: materials as (kind, name, energy, price or disposal cost),
+    # product edges as (material, product, quantity) and auxiliary edges as (material, auxiliary)
+    root: str
+    materials: List[Tuple[str, str, float, int]]
+    products: List[Tuple[str, str, float]]
+    requires: List[Tuple[str, str]]
+
+    def add_materials(self, rs: ReactorSimulator) -> None:
+        for kind, name, energy, value in self.materials:
+            if kind == "fuel":
+                rs.add_fuel(name, energy, value)
+            elif kind == "waste":
+                rs.add_waste(name, energy, value)
+            else:
+                rs.add_auxiliary(name)
+
+    def add_products(self, rs: ReactorSimulator) -> None:
+        for material, product, quantity in self.products:
+            rs.get_material(material).add_product(rs.get_material(product), quantity)
+
+    def set_auxiliaries(self, rs: ReactorSimulator) -> None:
+        for material, auxiliary in self.requires:
+            rs.get_material(material).set_auxiliary(rs.get_material(auxiliary))
+
+    def build(self) -> ReactorSimulator:
+        rs = ReactorSimulator()
+        self.add_materials(rs)
+        self.add_products(rs)
+        self.set_auxiliaries(rs)
+        return rs
+
+
+def _tree(nodes, parent_of, rng, prefix=""):
+    # nodes 1..nodes-1 hang from parent_of(i) < i; materials with products are fuels, the others waste
+    internal = {parent_of(i) for i in range(1, nodes)}
+    names = ["{}{}{}".format(prefix, "Fuel" if i in internal else "Waste", i) for i in range(nodes)]
+    materials = [("fuel", names[i], rng.uniform(1, 20), rng.randint(1, 100)) if i in internal else
+                 ("waste", names[i], rng.uniform(0, 2), rng.randint(1, 50)) for i in range(nodes)]
+    products = [(names[parent_of(i)], names[i], rng.uniform(0.1, 1)) for i in range(1, nodes)]
+    return names, materials, products
+
+
+def chain(nodes: int, seed: int = 0) -> Catalogue:
+    names, materials, products = _tree(nodes, lambda i: i - 1, random.Random(seed))
+    return Catalogue(names[0], materials, products, [])
+
+
+def decay_chain(nodes: int, seed: int = 0) -> Catalogue:
+    # chain of nodes // 3 fuels, each leaving a waste and needing an auxiliary of its own:
+    # Fuel i -> Waste i + Fuel i+1
+    rng = random.Random(seed)
+    levels = max(1, nodes // 3)
+    materials = []
+    products = []
+    requires = []
+    for i in range(levels):
+        fuel, waste, auxiliary = "Fuel{}".format(i), "Waste{}".format(i), "Aux{}".format(i)
+        materials += [("fuel", fuel, rng.uniform(1, 20), rng.randint(1, 100)),
+                      ("waste", waste, rng.uniform(0, 2), rng.randint(1, 50)), ("auxiliary", auxiliary, 0, 0)]
+        products.append((fuel, waste, rng.uniform(0.1, 1)))
+        if i + 1 < levels:
+            products.append((fuel, "Fuel{}".format(i + 1), rng.uniform(0.1, 1)))
+        requires.append((fuel, auxiliary))
+    return Catalogue("Fuel0", materials, products, requires)
+
+
+def wide(nodes: int, seed: int = 0) -> Catalogue:
+    names, materials, products = _tree(nodes, lambda i: 0, random.Random(seed))
+    return Catalogue(names[0], materials, products, [])
+
+
+def balanced(nodes: int, seed: int = 0, branching: int = 4) -> Catalogue:
+    names, materials, products = _tree(nodes, lambda i: (i - 1) // branching, random.Random(seed))
+    return Catalogue(names[0], materials, products, [])
+
+
+def auxiliary_heavy(nodes: int, seed: int = 0, branching: int = 4) -> Catalogue:
+    # balanced tree whose decomposing materials each need one of nodes // 10 auxiliaries
+    rng = random.Random(seed)
+    names, materials, products = _tree(nodes, lambda i: (i - 1) // branching, rng)
+    auxiliaries = ["Aux{}".format(i) for i in range(max(1, nodes // 10))]
+    materials += [("auxiliary", name, 0, 0) for name in auxiliaries]
+    requires = [(kind_name[1], rng.choice(auxiliaries)) for kind_name in materials if kind_name[0] == "fuel"]
+    return Catalogue(names[0], materials, products, requires)
+
+
+def forest(nodes: int, seed: int = 0, trees: int = 8, branching: int = 4) -> Catalogue:
+    # root fuel whose products are trees balanced trees of nodes // trees materials each
+    rng = random.Random(seed)
+    materials = [("fuel", "Root", rng.uniform(1, 20), rng.randint(1, 100))]
+    products = []
+    for tree in range(trees):
+        names, tree_materials, tree_products = _tree(max(2, nodes // trees), lambda i: (i - 1) // branching, rng,
+                                                     "Tree{}".format(tree))
+        materials += tree_materials
+        products += [("Root", names[0], rng.uniform(0.1, 1))] + tree_products
+    return Catalogue("Root", materials, products, [])
+
+
+SHAPES = {"chain": chain, "decay": decay_chain, "wide": wide, "balanced": balanced, "auxiliary": auxiliary_heavy}
@@ -0,0 +1,111 @@
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+from benchmarks.generators import SHAPES
+from nuclear.reactor import ReactorSimulator
+
+# distinct inventories used by the find_inconsistency queries
+INVENTORIES = 8
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def run_case(shape, nodes, seed, queries):
+    catalogue = SHAPES[shape](nodes, seed)
+    rng = random.Random(seed)
+    result = {}
+
+    rs = ReactorSimulator()
+    catalogue.add_materials(rs)
+    start = time.perf_counter()
+    catalogue.add_products(rs)
+    result["add_product_per_s"] = _rate(len(catalogue.products), time.perf_counter() - start)
+    catalogue.set_auxiliaries(rs)
+
+    start = time.perf_counter()
+    rs.simulate_reaction(catalogue.root, 1)
+    result["simulate_cold_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(queries):
+        rs.simulate_reaction(catalogue.root, rng.uniform(1, 100))
+    result["simulate_warm_per_s"] = _rate(queries, time.perf_counter() - start)
+
+    # each inventory holds half of the auxiliaries, so the queries cycle through a few of them
+    auxiliaries = sorted({name for _, name in catalogue.requires})
+    inventories = [set(rng.sample(auxiliaries, len(auxiliaries) // 2)) for _ in range(min(queries, INVENTORIES))]
+    start = time.perf_counter()
+    rs.find_inconsistency(catalogue.root, set())
+    result["find_inconsistency_cold_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(queries):
+        rs.find_inconsistency(catalogue.root, inventories[i % len(inventories)])
+    result["find_inconsistency_warm_per_s"] = _rate(queries, time.perf_counter() - start)
+
+    leaves = [product for _, product, _ in catalogue.products if product.startswith("Waste")]
+    targets = rng.sample(leaves, min(queries, len(leaves)))
+    for i in range(len(targets)):
+        rs.add_fuel("Intermediate{}".format(i), 1, 1)
+    start = time.perf_counter()
+    for i, target in enumerate(targets):
+        rs.add_intermediate(target, "Intermediate{}".format(i), (0.5, 0.5))
+    result["add_intermediate_per_s"] = _rate(len(targets), time.perf_counter() - start)
+
+    tracemalloc.start()
+    catalogue.build().simulate_reaction(catalogue.root, 1)
+    result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # rates must not drop, and times and memory must not grow, by more than tolerance
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(case, {}).get(metric)
+            if old is None or old == 0:
+                continue
+            ratio = value / old
+            worse = ratio < 1 - tolerance if metric.endswith("_per_s") else ratio > 1 + tolerance
+            print("{:<18} {:<30} {:8.2f}x{}".format(case, metric, ratio, "  REGRESSION" if worse else ""))
+            if worse:
+                regressions.append((case, metric))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReactorSimulator benchmarks on synthetic material graphs")
+    parser.add_argument("--shapes", nargs="+", default=sorted(SHAPES), choices=sorted(SHAPES))
+    parser.add_argument("--min-exponent", type=int, default=2)
+    parser.add_argument("--max-exponent", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--output", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {}
+    for shape in args.shapes:
+        for exponent in range(args.min_exponent, args.max_exponent + 1):
+            case = "{}/{}".format(shape, 10 ** exponent)
+            results[case] = run_case(shape, 10 ** exponent, args.seed, args.queries)
+            print(case, json.dumps(results[case]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(), "seed": args.seed, "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import csv
+import json
+from typing import Iterator, Tuple
+from nuclear.errors import ReactorException
+
+# Catalogue records, one per CSV row or JSON line:
+#   fuel, <name>, <energy>, <price>
+#   waste, <name>, <energy>, <disposal_cost>
+#   auxiliary, <name>
+#   product, <material>, <product>, <quantity>
+#   requires, <material>, <auxiliary>
+FIELDS = {
+    "fuel": ("name", "energy", "price"),
+    "waste": ("name", "energy", "disposal_cost"),
+    "auxiliary": ("name",),
+    "product": ("material", "product", "quantity"),
+    "requires": ("material", "auxiliary"),
+}
+NUMERIC = {"energy", "price", "disposal_cost", "quantity"}
+
+
+def _number(value):
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("not a number: {!r}".format(value))
+    return value
+
+
+def _name(value):
+    if not isinstance(value, str):
+        raise ValueError("not a name: {!r}".format(value))
+    return value
+
+
+def _record(kind, values, line):
+    if not isinstance(kind, str) or kind not in FIELDS:
+        raise ReactorException("Unknown record '{}' at line {}".format(kind, line))
+    fields = FIELDS[kind]
+    if len(values) != len(fields):
+        raise ReactorException("Record '{}' at line {} needs {} values".format(kind, line, len(fields)))
+    try:
+        return (kind,) + tuple(_number(value) if field in NUMERIC else _name(value)
+                               for field, value in zip(fields, values))
+    except ValueError as e:
+        raise ReactorException("Record '{}' at line {}: {}".format(kind, line, e))
+
+
+def _read_csv(stream):
+    for line, row in enumerate(csv.reader(stream), 1):
+        if not row or row[0].startswith("#") or (line == 1 and row[0] == "kind"):
+            continue
+        values = [value.strip() for value in row[1:]]
+        while values and not values[-1]:
+            values.pop()
+        yield _record(row[0].strip(), values, line)
+
+
+def _read_json_lines(stream):
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ReactorException("Invalid JSON at line {}: {}".format(line, e))
+        if not isinstance(data, dict):
+            raise ReactorException("Record at line {} is not a JSON object".format(line))
+        kind = data.get("kind")
+        try:
+            values = [data[field] for field in FIELDS.get(kind, ())] if isinstance(kind, str) else []
+        except KeyError as e:
+            raise ReactorException("Record '{}' at line {} misses {}".format(kind, line, e))
+        yield _record(kind, values, line)
+
+
+def read_catalogue(path: str) -> Iterator[Tuple]:
+    # streams the records of a .csv or .jsonl catalogue one at a time
+    with open(path, newline="", encoding="utf-8") as stream:
+        if path.endswith(".csv"):
+            yield from _read_csv(stream)
+        else:
+            yield from _read_json_lines(stream)
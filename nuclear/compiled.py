@@ -0,0 +1,221 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import List, Optional, Set, Tuple
+from nuclear.errors import ReactorException
+from nuclear.materials import Waste
+
+# snapshot layout: header, the int64/float64 sections in _SECTIONS order, then the UTF-8 names
+_MAGIC = b"NUCR"
+_HEADER = struct.Struct("<4sc3xqqq")
+# (section, typecode, length in nodes or edges, extra items); the disposal of non-waste materials is NaN
+_SECTIONS = (("offsets", "q", "nodes", 1), ("children", "q", "edges", 0), ("quantities", "d", "edges", 0),
+             ("energy", "d", "nodes", 0), ("disposal", "d", "nodes", 0), ("auxiliary", "q", "nodes", 0),
+             ("name_offsets", "q", "nodes", 1), ("order", "q", "nodes", 0))
+
+
+class _MappedNames:
+    # names stored in a snapshot, decoded on access
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+
+class _MappedIndex:
+    # name -> node lookup by binary search over the node indices sorted by encoded name
+    def __init__(self, blob, offsets, order):
+        self._blob = blob
+        self._offsets = offsets
+        self._order = order
+
+    def __getitem__(self, name):
+        key = name.encode("utf-8")
+        low, high = 0, len(self._order)
+        while low < high:
+            middle = (low + high) // 2
+            node = self._order[middle]
+            if bytes(self._blob[self._offsets[node]:self._offsets[node + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._order):
+            node = self._order[low]
+            if bytes(self._blob[self._offsets[node]:self._offsets[node + 1]]) == key:
+                return node
+        raise KeyError(name)
+
+
+class CompiledReactor:
+    # Frozen, array-backed copy of a material graph: the products of node i are
+    # children[offsets[i]:offsets[i+1]] with yields quantities[offsets[i]:offsets[i+1]],
+    # auxiliary[i] is the index of the auxiliary of node i or -1.
+    def __init__(self, names, offsets, children, quantities, energy, disposal, auxiliary, index=None):
+        self._names = names
+        self._offsets = offsets
+        self._children = children
+        self._quantities = quantities
+        self._energy = energy
+        self._disposal = disposal
+        self._auxiliary = auxiliary
+        self._index = {name: i for i, name in enumerate(names)} if index is None else index
+
+    @classmethod
+    def from_materials(cls, materials) -> "CompiledReactor":
+        nodes = list(materials)
+        index = {mat: i for i, mat in enumerate(nodes)}
+        offsets = array("q", [0])
+        children = array("q")
+        quantities = array("d")
+        auxiliary = array("q")
+        # products and auxiliaries that were never registered still belong to the graph, they are
+        # appended to nodes and reached later by the same loop
+        for mat in nodes:
+            for prod, qt in mat._products.values():
+                i = index.get(prod)
+                if i is None:
+                    i = index[prod] = len(nodes)
+                    nodes.append(prod)
+                children.append(i)
+                quantities.append(qt)
+            offsets.append(len(children))
+            aux = mat.auxiliary
+            if aux is None:
+                auxiliary.append(-1)
+            else:
+                i = index.get(aux)
+                if i is None:
+                    i = index[aux] = len(nodes)
+                    nodes.append(aux)
+                auxiliary.append(i)
+        energy = array("d", [mat.energy for mat in nodes])
+        disposal = array("d", [mat.disposal_cost if isinstance(mat, Waste) else float("nan") for mat in nodes])
+        return cls([mat.name for mat in nodes], offsets, children, quantities, energy, disposal, auxiliary)
+
+    def save(self, path: str) -> None:
+        encoded = [self._names[i].encode("utf-8") for i in range(len(self))]
+        name_offsets = array("q", [0])
+        for name in encoded:
+            name_offsets.append(name_offsets[-1] + len(name))
+        sections = {
+            "offsets": self._offsets, "children": self._children, "quantities": self._quantities,
+            "energy": self._energy, "disposal": self._disposal, "auxiliary": self._auxiliary,
+            "name_offsets": name_offsets, "order": array("q", sorted(range(len(encoded)), key=encoded.__getitem__)),
+        }
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, sys.byteorder[0].encode(), len(self), len(self._children), name_offsets[-1]))
+            for name, _, _, _ in _SECTIONS:
+                f.write(memoryview(sections[name]).cast("B"))
+            f.write(b"".join(encoded))
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledReactor":
+        # the arrays are views on a read-only memory map, shared by every process mapping the same file
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ReactorException("Truncated reactor snapshot: {}".format(path))
+            magic, byteorder, nodes, edges, names_size = _HEADER.unpack(header)
+            if magic != _MAGIC or byteorder != sys.byteorder[0].encode():
+                raise ReactorException("Not a reactor snapshot for this platform: {}".format(path))
+            counts = {"nodes": nodes, "edges": edges}
+            size = _HEADER.size + names_size + sum(8 * (counts[count] + extra) for _, _, count, extra in _SECTIONS)
+            if min(nodes, edges, names_size) < 0 or os.fstat(f.fileno()).st_size != size:
+                raise ReactorException("Truncated reactor snapshot: {}".format(path))
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+        position = _HEADER.size
+        sections = {}
+        for name, typecode, count, extra in _SECTIONS:
+            size = 8 * (counts[count] + extra)
+            sections[name] = view[position:position + size].cast(typecode)
+            position += size
+        blob = view[position:]
+        names = _MappedNames(blob, sections["name_offsets"])
+        index = _MappedIndex(blob, sections["name_offsets"], sections["order"])
+        return cls(names, sections["offsets"], sections["children"], sections["quantities"], sections["energy"],
+                   sections["disposal"], sections["auxiliary"], index)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def names(self) -> List[str]:
+        return [self._names[i] for i in range(len(self))]
+
+    def find_inconsistency(self, fuel: str, auxiliary: Set[str]) -> Optional[str]:
+        offsets, children, aux, names = self._offsets, self._children, self._auxiliary, self._names
+        root = self._index[fuel]
+        # a material reached again through another product has already been checked
+        visited = set()
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            start, end = offsets[node], offsets[node + 1]
+            if start != end:
+                if aux[node] != -1 and names[aux[node]] not in auxiliary:
+                    return names[aux[node]]
+                nodes.extend(children[start:end])
+        return None
+
+    def simulate_reaction(self, fuel: str, quantity: float) -> Tuple[List[Tuple[str, float]], float, float]:
+        nodes, unused, energy, disposal = self.simulate_reaction_nodes(fuel, quantity)
+        return [(self._names[node], qt) for node, qt in zip(nodes, unused)], energy, disposal
+
+    def simulate_reaction_nodes(self, fuel: str, quantity: float) -> Tuple[array, array, float, float]:
+        # simulate_reaction with the unused waste as arrays of node indices (into names) and quantities.
+        # Each material is evaluated once with the grams reaching it through all of its parents,
+        # the unused waste is listed in the order in which a depth-first visit first reaches it.
+        offsets, children, quantities = self._offsets, self._children, self._quantities
+        preorder, order = self._walk(self._index[fuel])
+        reached = {order[0]: quantity}
+        energy = 0
+        disposal = 0
+        for node in order:
+            start, end = offsets[node], offsets[node + 1]
+            if start == end:
+                if self._disposal[node] != self._disposal[node]:
+                    raise ReactorException("{} has no products and is not a waste".format(self._names[node]))
+                disposal += self._disposal[node] * reached[node]
+            else:
+                energy += self._energy[node] * reached[node]
+                for edge in range(start, end):
+                    child = children[edge]
+                    reached[child] = reached.get(child, 0) + quantities[edge] * reached[node]
+        nodes = array("q", (node for node in preorder if offsets[node] == offsets[node + 1]))
+        return nodes, array("d", (reached[node] for node in nodes)), energy, disposal
+
+    def _walk(self, root):
+        # nodes reachable from root in depth-first preorder, and in topological order
+        offsets, children = self._offsets, self._children
+        preorder = [root]
+        postorder = []
+        finished = {root: False}
+        stack = [(root, offsets[root])]
+        while stack:
+            node, edge = stack[-1]
+            if edge < offsets[node + 1]:
+                stack[-1] = (node, edge + 1)
+                child = children[edge]
+                if child not in finished:
+                    finished[child] = False
+                    preorder.append(child)
+                    stack.append((child, offsets[child]))
+                elif not finished[child]:
+                    raise ReactorException("Cycle of products through {}".format(self._names[child]))
+            else:
+                stack.pop()
+                finished[node] = True
+                postorder.append(node)
+        postorder.reverse()
+        return preorder, postorder
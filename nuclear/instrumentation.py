@@ -0,0 +1,149 @@
+import bisect
+import time
+from typing import Dict, Optional
+from nuclear.errors import ReactorException
+from nuclear.materials import NuclearMaterial
+from nuclear.reactor import ReactorSimulator
+
+# upper bounds in seconds of the latency histogram buckets
+BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1, float("inf"))
+
+# instrumentation enabled on each target: the ReactorSimulator class or a single simulator
+_enabled = {}
+# original methods of the materials, patched while any instrumentation is enabled
+_material_originals = {}
+
+
+def _counted(counter, function):
+    # counts the calls made on the materials of the instrumented simulators
+    def wrapper(material):
+        metrics = _enabled.get(material._owner) or _enabled.get(ReactorSimulator)
+        if metrics is not None:
+            metrics.counters[counter] += 1
+        return function(material)
+    return wrapper
+
+
+class Instrumentation:
+    # Counters, timers and per-fuel latency histograms for the hot paths of ReactorSimulator. While
+    # enabled the instrumented methods are replaced on the simulator given to the constructor, or on
+    # the ReactorSimulator class for all simulators when there is none, so that disabled
+    # instrumentation leaves the original methods in place and costs nothing. The id-based cores
+    # are instrumented, so the name-based and the id-based queries are both measured.
+    def __init__(self, simulator: Optional[ReactorSimulator] = None):
+        self._target = ReactorSimulator if simulator is None else simulator
+        self._originals = {}
+        self.reset()
+
+    def reset(self) -> None:
+        # materials whose per-gram totals were combined, and walks building the unused waste or the
+        # required auxiliaries of the material asked for
+        self.counters = {"yield_nodes": 0, "unused_walks": 0, "auxiliary_walks": 0, "inconsistency_checks": 0}
+        self.timers = {}
+        self.histograms = {}
+
+    def enable(self) -> "Instrumentation":
+        if self._target in _enabled:
+            raise ReactorException("Instrumentation already enabled")
+        _enabled[self._target] = self
+        if not _material_originals:
+            for name, counter in (("_combine_yields", "yield_nodes"), ("_combine_unused", "unused_walks"),
+                                  ("_combine_auxiliaries", "auxiliary_walks")):
+                _material_originals[name] = NuclearMaterial.__dict__[name]
+                setattr(NuclearMaterial, name, _counted(counter, _material_originals[name]))
+        self._patch("simulate_reaction_by_id", self._timed(
+            "simulate_reaction", lambda simulator, fuel, quantity: simulator._by_id[fuel].name))
+        self._patch("_inconsistency", self._inconsistency)
+        self._patch("add_intermediate_by_id", self._timed("add_intermediate", None))
+        return self
+
+    def disable(self) -> None:
+        for name, original in self._originals.items():
+            if self._target is ReactorSimulator:
+                setattr(ReactorSimulator, name, original)
+            else:
+                delattr(self._target, name)
+        self._originals.clear()
+        if _enabled.pop(self._target, None) is self and not _enabled:
+            for name, original in _material_originals.items():
+                setattr(NuclearMaterial, name, original)
+            _material_originals.clear()
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _patch(self, name, wrap):
+        # wrappers take the simulator as their first argument, bound here when patching a single one
+        if self._target is ReactorSimulator:
+            self._originals[name] = ReactorSimulator.__dict__[name]
+            setattr(ReactorSimulator, name, wrap(self._originals[name]))
+        else:
+            self._originals[name] = getattr(type(self._target), name)
+            setattr(self._target, name, wrap(self._originals[name]).__get__(self._target))
+
+    def _timed(self, operation, label):
+        # label takes the arguments of the method and returns the fuel of its histogram
+        def wrap(function):
+            def wrapper(simulator, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(simulator, *args, **kwargs)
+                finally:
+                    self._observe(operation, None if label is None else label(simulator, *args, **kwargs),
+                                  time.perf_counter() - start)
+            return wrapper
+        return wrap
+
+    def _inconsistency(self, function):
+        timed = self._timed("find_inconsistency", lambda simulator, fuel, *inventory: fuel.name)(function)
+
+        def wrapper(simulator, fuel, *inventory):
+            result = timed(simulator, fuel, *inventory)
+            required = fuel.required_auxiliary_materials
+            self.counters["inconsistency_checks"] += len(required) if result is None else required.index(result) + 1
+            return result
+        return wrapper
+
+    def _observe(self, operation, fuel, seconds):
+        timer = self.timers.setdefault(operation, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+        if fuel is not None:
+            histogram = self.histograms.setdefault((operation, fuel), [0] * len(BUCKETS) + [0.0])
+            histogram[bisect.bisect_left(BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            "counters": dict(self.counters),
+            "timers": {operation: {"count": count, "seconds": seconds}
+                       for operation, (count, seconds) in self.timers.items()},
+            "histograms": {operation: {fuel: {"buckets": dict(zip(BUCKETS, histogram[:-1])), "seconds": histogram[-1]}
+                                       for (op, fuel), histogram in self.histograms.items() if op == operation}
+                           for operation in {op for op, _ in self.histograms}},
+        }
+
+    def to_prometheus(self) -> str:
+        lines = ["# TYPE reactor_nodes_total counter"]
+        for counter, value in self.counters.items():
+            lines.append('reactor_nodes_total{{counter="{}"}} {}'.format(counter, value))
+        lines.append("# TYPE reactor_calls_total counter")
+        for operation, (count, _) in self.timers.items():
+            lines.append('reactor_calls_total{{operation="{}"}} {}'.format(operation, count))
+        lines.append("# TYPE reactor_seconds_total counter")
+        for operation, (_, seconds) in self.timers.items():
+            lines.append('reactor_seconds_total{{operation="{}"}} {}'.format(operation, seconds))
+        lines.append("# TYPE reactor_latency_seconds histogram")
+        for (operation, fuel), histogram in self.histograms.items():
+            labels = 'operation="{}",fuel="{}"'.format(operation, fuel.replace("\\", "\\\\").replace('"', '\\"'))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram):
+                cumulative += count
+                lines.append('reactor_latency_seconds_bucket{{{},le="{}"}} {}'.format(
+                    labels, "+Inf" if bound == float("inf") else bound, cumulative))
+            lines.append("reactor_latency_seconds_sum{{{}}} {}".format(labels, histogram[-1]))
+            lines.append("reactor_latency_seconds_count{{{}}} {}".format(labels, cumulative))
+        return "\n".join(lines) + "\n"
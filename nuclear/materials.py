@@ -1,9 +1,18 @@
 from abc import ABC, abstractmethod
+from types import MappingProxyType
 from typing import List, Tuple, Optional
 from nuclear.errors import ReactorException
 
+# shared by the materials without products or parents until they get their first one
+_NO_PRODUCTS = MappingProxyType({})
+_NO_PARENTS = ()
+# auxiliaries of a material below one whose required auxiliaries are cached
+_BELOW_CACHED = object()
+
 
 class Material(ABC):
+    __slots__ = ()
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -39,11 +48,24 @@ class Material(ABC):
 
 
 class NuclearMaterial(Material):
+    __slots__ = ("_name", "_energy", "_products", "_product_list", "_auxiliary", "_parents",
+                 "_yields", "_unused", "_auxiliaries", "_owner", "_id")
+
     def __init__(self, name, energy):
         self._name = name
         self._energy = energy
-        self._products = []
+        # products keyed by name, in insertion order
+        self._products = _NO_PRODUCTS
+        self._product_list = None
         self._auxiliary = None
+        # materials having this one among their products, in the order they added it
+        self._parents = _NO_PARENTS
+        self._yields = None
+        self._unused = None
+        self._auxiliaries = None
+        # simulator notified of the changes, if any, and the id it gave to the material
+        self._owner = None
+        self._id = -1
 
     @property
     def name(self) -> str:
@@ -63,19 +85,207 @@ class NuclearMaterial(Material):
 
     def set_auxiliary(self, material):
         self._auxiliary = material
+        self._invalidate(yields=False)
+        self._changed("set_auxiliary", None if material is None else material.name)
 
     def add_product(self, product, quantity):
-        self._products.append((product, quantity))
+        # adding a product that is already present updates its quantity in place
+        product = self._adopt(product)
+        if not self._products:
+            self._products = {}
+        self._products[product.name] = (product, quantity)
+        self._product_list = None
+        if not product._parents:
+            product._parents = [self]
+        elif self not in product._parents:
+            product._parents.append(self)
+        self._invalidate()
+        self._changed("add_product", product.name, quantity)
 
     @property
     def products(self):
-        return self._products    
+        if self._product_list is None:
+            if self._owner is not None and self._owner._base is not None:
+                # a scenario hands out its own copies of the products it shares with the simulators it
+                # was forked from, so that changing them does not change those simulators
+                for prod, _ in list(self._products.values()):
+                    self._owner._adopt(prod)
+            self._product_list = list(self._products.values())
+        return self._product_list
+
+    def has_product(self, product: str) -> bool:
+        return product in self._products
+
+    @property
+    def parent(self) -> Optional["NuclearMaterial"]:
+        return self._parents[0] if self._parents else None
+
+    @property
+    def parents(self) -> List["NuclearMaterial"]:
+        return list(self._parents)
 
     def remove_product(self, product):
-        self._products = [(prod, qt) for prod, qt in self._products if prod.name != product]
+        removed = self._products.get(product)
+        if removed is not None:
+            self._remove_product(removed[0])
+
+    def _remove_product(self, product):
+        # product must be one of the products of this material
+        product = self._adopt(product)
+        del self._products[product.name]
+        product._parents.remove(self)
+        self._product_list = None
+        self._invalidate()
+        self._changed("remove_product", product.name)
+
+    @property
+    def yields(self) -> Tuple[Tuple[Tuple[str, float], ...], float, float]:
+        # Unused waste, energy and disposal of the reaction of ONE GRAM of the material, cached until
+        # one of its descendants changes: energy and disposal on every material of the reaction, the
+        # unused waste only on the material asked for
+        energy, disposal = self.totals
+        if self._unused is None:
+            self._unused = self._combine_unused()
+        return self._unused, energy, disposal
+
+    @property
+    def totals(self) -> Tuple[float, float]:
+        # energy and disposal of yields, without walking the unused waste
+        return self._cached("_yields", NuclearMaterial._combine_yields)
+
+    @property
+    def id(self) -> int:
+        # dense id given by the simulator that created the material, -1 for other materials
+        return self._id
+
+    @property
+    def required_auxiliaries(self) -> Tuple[str, ...]:
+        # Names of the auxiliaries needed by the decomposing materials of the reaction, without
+        # duplicates, in the order in which find_inconsistency checks them
+        return tuple(dict.fromkeys(auxiliary.name for auxiliary in self.required_auxiliary_materials))
+
+    @property
+    def required_auxiliary_materials(self) -> Tuple["Material", ...]:
+        # same auxiliaries as required_auxiliaries, as materials cached on the material asked for
+        if self._auxiliaries is None or self._auxiliaries is _BELOW_CACHED:
+            self._auxiliaries = self._combine_auxiliaries()
+        return self._auxiliaries
+
+    def topological_order(self) -> List["NuclearMaterial"]:
+        # this material and its descendants, each one before all of its products
+        order = self._walk(lambda material: False)[1]
+        order.reverse()
+        return order
+
+    def _cached(self, attribute, combine):
+        if getattr(self, attribute) is None:
+            # products shared by several materials are combined once
+            for material in self._walk(lambda material: getattr(material, attribute) is not None)[1]:
+                setattr(material, attribute, combine(material))
+        return getattr(self, attribute)
+
+    def _walk(self, done, reverse=False):
+        # Descendants in preorder and each after its products, skipping the materials for which done
+        # is true and their products, visiting the products from the last to the first if reverse.
+        # Depth-first walk on an explicit stack, so that deep chains do not hit the recursion limit.
+        if done(self):
+            return [], []
+        order = reversed if reverse else iter
+        preorder = [self]
+        postorder = []
+        finished = {self: False}
+        stack = [(self, order(self._products.values()))]
+        while stack:
+            material, products = stack[-1]
+            for prod, _ in products:
+                if prod in finished:
+                    if not finished[prod]:
+                        raise ReactorException("Cycle of products through {}".format(prod.name))
+                elif not done(prod):
+                    finished[prod] = False
+                    preorder.append(prod)
+                    stack.append((prod, order(prod._products.values())))
+                    break
+            else:
+                stack.pop()
+                finished[material] = True
+                postorder.append(material)
+        return preorder, postorder
+
+    def _combine_yields(self):
+        if not self._products:
+            if not isinstance(self, Waste):
+                raise ReactorException("{} has no products and is not a waste".format(self._name))
+            return 0, self.disposal_cost
+        energy = self._energy
+        disposal = 0
+        for prod, qt in self._products.values():
+            prod_energy, prod_disposal = prod._yields
+            energy += qt * prod_energy
+            disposal += qt * prod_disposal
+        return energy, disposal
+
+    def _combine_unused(self):
+        # grams of each descendant reached by one gram of this material, pushed down in topological
+        # order; waste reached through several products is merged at its first position
+        preorder, postorder = self._walk(lambda material: False)
+        reached = {self: 1}
+        for material in reversed(postorder):
+            for prod, qt in material._products.values():
+                reached[prod] = reached.get(prod, 0) + qt * reached[material]
+        return tuple((material._name, reached[material]) for material in preorder if not material._products)
+
+    def _combine_auxiliaries(self):
+        # find_inconsistency visits the products from the last to the first; the descendants are
+        # marked so that their changes reach this cache
+        auxiliaries = {}
+        for material in self._walk(lambda material: False, reverse=True)[0]:
+            if material._auxiliaries is None:
+                material._auxiliaries = _BELOW_CACHED
+            if material._products and material._auxiliary is not None:
+                auxiliaries[material._auxiliary] = None
+        return tuple(auxiliaries)
+
+    def _copy(self):
+        copy = object.__new__(type(self))
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                setattr(copy, slot, getattr(self, slot))
+        copy._products = dict(self._products) if self._products else _NO_PRODUCTS
+        copy._product_list = None
+        return copy
+
+    def _relink(self, product):
+        # replaces the product with the same name by its copy, same reaction so caches stay valid
+        self._products[product.name] = (product, self._products[product.name][1])
+        self._product_list = None
+        product._parents = [parent for parent in product._parents if parent.name != self._name] + [self]
+
+    def _adopt(self, product):
+        # the parents of a product shared with another simulator must not change, so a scenario
+        # that changes them works on its own copy
+        return product if self._owner is None else self._owner._adopt(product)
+
+    def _changed(self, operation, *args):
+        if self._owner is not None:
+            self._owner._changed(operation, (self._name,) + args)
+
+    def _invalidate(self, yields=True):
+        # a cached ancestor implies cached or marked descendants, so the walk can stop at empty caches
+        materials = [self]
+        while materials:
+            material = materials.pop()
+            if material._auxiliaries is not None or (yields and material._yields is not None):
+                material._auxiliaries = None
+                if yields:
+                    material._yields = None
+                    material._unused = None
+                materials.extend(material._parents)
 
 
 class Fuel(NuclearMaterial):
+    __slots__ = ("_price",)
+
     def __init__(self, name, energy, price):
         super().__init__(name, energy)
         self._price = price
@@ -90,6 +300,8 @@ class Fuel(NuclearMaterial):
 
 
 class Waste(NuclearMaterial):
+    __slots__ = ("_disposal_cost",)
+
     def __init__(self, name, energy, disposal_cost):
         super().__init__(name, energy)
         self._disposal_cost = disposal_cost
@@ -104,6 +316,8 @@ class Waste(NuclearMaterial):
 
 
 class Auxiliary(NuclearMaterial):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name, 0)
 
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from nuclear.compiled import CompiledReactor
+
+# state of a worker process: the snapshot it mapped last
+_path = None
+_reactor = None
+
+
+def _simulate(job):
+    # per-gram result of a fuel, its unused waste as arrays that pickle as plain bytes
+    global _path, _reactor
+    path, fuel = job
+    if path != _path:
+        _reactor = CompiledReactor.load(path)
+        _path = path
+    return _reactor.simulate_reaction_nodes(fuel, 1)
+
+
+def _shutdown(executor, directory):
+    executor.shutdown()
+    directory.cleanup()
+
+
+class Pool:
+    # Worker processes kept by a simulator across calls. The workers map a snapshot of the current
+    # version of the simulator, written once per version, and the per-gram results they computed are
+    # kept until the version changes; tasks only carry the snapshot path and a fuel name.
+    def __init__(self, simulator, workers):
+        self.workers = workers
+        self._directory = tempfile.TemporaryDirectory()
+        self._executor = ProcessPoolExecutor(workers)
+        self._version = None
+        self._path = None
+        self._names = None
+        self._yields = {}
+        self._finalizer = weakref.finalize(simulator, _shutdown, self._executor, self._directory)
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def yields(self, simulator, fuels):
+        # per-gram (unused, energy, disposal) of each fuel, computed by the workers
+        self._update(simulator)
+        missing = [fuel for fuel in dict.fromkeys(fuels) if fuel not in self._yields]
+        if missing:
+            chunksize = max(1, len(missing) // (4 * self.workers))
+            results = self._executor.map(_simulate, [(self._path, fuel) for fuel in missing], chunksize=chunksize)
+            for fuel, (nodes, unused, energy, disposal) in zip(missing, results):
+                self._yields[fuel] = tuple(zip(map(self._names.__getitem__, nodes), unused)), energy, disposal
+        return {fuel: self._yields[fuel] for fuel in fuels}
+
+    def combined_yields(self, simulator, material):
+        # per-gram result of material from those of its products, the products without cached
+        # yields being computed by the workers
+        self._update(simulator)
+        if material.name not in self._yields:
+            cold = [prod.name for prod, _ in material._products.values() if prod._unused is None]
+            yields = self.yields(simulator, cold)
+            unused = {}
+            energy = material.energy
+            disposal = 0
+            for prod, qt in material._products.values():
+                prod_unused, prod_energy, prod_disposal = yields[prod.name] if prod.name in yields else prod.yields
+                for name, prod_qt in prod_unused:
+                    unused[name] = unused.get(name, 0) + qt * prod_qt
+                energy += qt * prod_energy
+                disposal += qt * prod_disposal
+            self._yields[material.name] = tuple(unused.items()), energy, disposal
+        return self._yields[material.name]
+
+    def _update(self, simulator):
+        if self._version == simulator.version:
+            return
+        previous = self._path
+        compiled = simulator.compile()
+        self._path = os.path.join(self._directory.name, "reactor-{}.snapshot".format(simulator.version))
+        compiled.save(self._path)
+        if previous is not None:
+            os.remove(previous)
+        self._names = compiled.names
+        self._yields.clear()
+        self._version = simulator.version
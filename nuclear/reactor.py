@@ -1,56 +1,525 @@
+import os
+from collections import ChainMap, deque
 from nuclear.materials import Material, Fuel, Waste, Auxiliary
-from typing import Tuple, List, Optional, Set
+from nuclear.compiled import CompiledReactor
+from nuclear.catalogue import read_catalogue
+from nuclear import parallel
+from nuclear.errors import ReactorException
+from typing import Tuple, List, Optional, Set, NamedTuple, Dict, Iterator, Iterable, Union
+
+
+class Change(NamedTuple):
+    # one entry of the change journal: the operation and its arguments, with materials given by name
+    version: int
+    operation: str
+    args: tuple
+
+
+class Sensitivity(NamedTuple):
+    # partial derivatives of the energy and disposal of a reaction with respect to the quantity of every
+    # (material, product) edge, the energy of every material and the disposal cost of every material
+    edge_energy: Dict[Tuple[str, str], float]
+    edge_disposal: Dict[Tuple[str, str], float]
+    energy: Dict[str, float]
+    disposal: Dict[str, float]
+
+
+class ReactionStep(NamedTuple):
+    # one generation of a reaction: the materials at that depth with their grams, and the energy
+    # and disposal cost accumulated up to that generation included
+    depth: int
+    materials: List[Tuple[str, float]]
+    energy: float
+    disposal: float
+
+
+class ValidationReport(NamedTuple):
+    # cycles of products, materials produced by more than one material, materials without products
+    # reached by a fuel that are not waste, and the auxiliaries missing for each fuel
+    cycles: List[List[str]]
+    shared: List[str]
+    non_waste_leaves: List[str]
+    missing_auxiliaries: Dict[str, List[str]]
+
+    @property
+    def valid(self) -> bool:
+        return not (self.cycles or self.non_waste_leaves or self.missing_auxiliaries)
 
 
 class ReactorSimulator:
-    def __init__(self):
+    def __init__(self, journal: bool = False):
         self._materials = {}
+        # dense integer id of each material name, and the material with each id
+        self._ids = {}
+        self._by_id = {}
+        self._base = None
+        # the changes are counted, and journaled for changes_since only when asked for
+        self._version = 0
+        self._journal = [] if journal else None
+        self._recording = True
+        # bit of each auxiliary in the inventory masks, and the required mask cached for each fuel
+        self._auxiliary_bits = {}
+        self._required_masks = {}
+        # process pool of simulate_many, started by the first call that needs it
+        self._pool = None
 
     # R1
     def add_fuel(self, name: str, energy: float, price: int) -> None:
-        self._materials[name] = Fuel(name, energy, price)
+        self._add(Fuel(name, energy, price), "add_fuel", (name, energy, price))
 
     def add_waste(self, name: str, energy: float, disposal_cost: int) -> None:
-        self._materials[name] = Waste(name, energy, disposal_cost)
+        self._add(Waste(name, energy, disposal_cost), "add_waste", (name, energy, disposal_cost))
 
     def add_auxiliary(self, name: str) -> None:
-        self._materials[name] = Auxiliary(name)
+        self._add(Auxiliary(name), "add_auxiliary", (name,))
+
+    def _add(self, material, operation, args):
+        material._owner = self
+        material._id = self._ids.setdefault(material.name, len(self._ids))
+        self._materials[material.name] = material
+        self._by_id[material._id] = material
+        self._changed(operation, args)
+
+    @property
+    def version(self) -> int:
+        # increased by every change to the materials or to their products and auxiliaries
+        return self._version
+
+    def changes_since(self, version: int) -> List[Change]:
+        if self._journal is None:
+            raise ReactorException("Changes are journaled only by simulators created with journal=True")
+        return self._journal[version:]
+
+    def replay(self, changes: List[Change]) -> None:
+        # applies the changes journaled by another simulator
+        for change in changes:
+            if change.operation in ("add_product", "remove_product", "set_auxiliary"):
+                material, *args = change.args
+                if change.operation != "remove_product":
+                    args[0] = None if args[0] is None else self.get_material(args[0])
+                getattr(self.get_material(material), change.operation)(*args)
+            else:
+                getattr(self, change.operation)(*change.args)
+
+    def _changed(self, operation, args):
+        if self._recording:
+            self._version += 1
+            if self._journal is not None:
+                self._journal.append(Change(self._version, operation, args))
 
     def get_material(self, name) -> Material:
-        return self._materials[name]
+        return self._own(self._materials[name])
+
+    def material_id(self, name: str) -> int:
+        return self._ids[name]
+
+    def get_material_by_id(self, material_id: int) -> Material:
+        return self._own(self._by_id[material_id])
+
+    def fork(self) -> "ReactorSimulator":
+        # Scenario that shares the materials of this simulator until it changes them: get_material
+        # copies a material, and the path from its root, the first time the scenario accesses it, and
+        # so do the products of its copies and a change to the parents of a shared product. The
+        # simulations and checks of the scenario read the materials it has not copied without copying
+        # them, so the materials of this simulator should not be changed while it is in use.
+        scenario = ReactorSimulator(self._journal is not None)
+        scenario._base = self
+        scenario._materials = ChainMap({}, self._materials)
+        scenario._ids = ChainMap({}, self._ids)
+        scenario._by_id = ChainMap({}, self._by_id)
+        return scenario
+
+    def _own(self, material):
+        if self._base is None or material._owner is self:
+            return material
+        result = self._copy(material)
+        materials = [(material, result)]
+        while materials:
+            material, copy = materials.pop()
+            for parent in material.parents:
+                # the parent of a shared material may already have been copied by this scenario
+                parent = self._materials.get(parent.name, parent)
+                if not parent.has_product(material.name):
+                    continue
+                if parent._owner is not self:
+                    parent_copy = self._copy(parent)
+                    materials.append((parent, parent_copy))
+                    parent = parent_copy
+                parent._relink(copy)
+        return result
+
+    def _adopt(self, material):
+        # this scenario's copy of a material shared with the simulators it was forked from
+        base = self._base
+        while base is not None:
+            if material._owner is base:
+                return self._own(material)
+            base = base._base
+        return material
+
+    def _copy(self, material):
+        copy = material._copy()
+        copy._owner = self
+        copy._parents = ()
+        self._materials[copy.name] = copy
+        if copy._id != -1:
+            self._by_id[copy._id] = copy
+        return copy
+
+    def load_catalogue(self, path: str) -> None:
+        # An edge that mentions a material not read yet waits for it, and so do the edges of the same
+        # material that follow it, so the file is read only once and the edges of every material are
+        # applied in file order. The whole load is journaled as a single change.
+        self._recording = False
+        try:
+            self._load_catalogue(path)
+        finally:
+            self._recording = True
+            self._changed("load_catalogue", (path,))
+
+    def _load_catalogue(self, path):
+        queued = {}
+        waiting = {}
+        for record in read_catalogue(path):
+            kind = record[0]
+            if kind == "fuel":
+                self.add_fuel(*record[1:])
+            elif kind == "waste":
+                self.add_waste(*record[1:])
+            elif kind == "auxiliary":
+                self.add_auxiliary(*record[1:])
+            elif record[1] in queued:
+                queued[record[1]].append(record)
+                continue
+            else:
+                queued[record[1]] = deque([record])
+                self._link(record[1], queued, waiting)
+                continue
+            for material in waiting.pop(record[1], ()):
+                self._link(material, queued, waiting)
+        if queued:
+            raise ReactorException("Unknown materials in catalogue: {}".format(", ".join(sorted(waiting))))
+
+    def _link(self, material, queued, waiting):
+        # applies the queued edges of material up to the first one naming a material not read yet
+        edges = queued[material]
+        while edges:
+            kind, _, other = edges[0][:3]
+            for name in (material, other):
+                if name not in self._materials:
+                    waiting.setdefault(name, []).append(material)
+                    return
+            edge = edges.popleft()
+            if kind == "product":
+                self.get_material(material).add_product(self.get_material(other), edge[3])
+            else:
+                self.get_material(material).set_auxiliary(self.get_material(other))
+        del queued[material]
+
+    def compile(self) -> CompiledReactor:
+        # later changes to the materials are not reflected in the compiled reactor
+        return CompiledReactor.from_materials(self._materials.values())
+
+    def save_snapshot(self, path: str) -> None:
+        # the snapshot can be opened with CompiledReactor.load
+        self.compile().save(path)
+
+    def validate(self, auxiliary: Optional[Set[str]] = None) -> ValidationReport:
+        # Single depth-first pass over all the materials. Missing auxiliaries are those required by a
+        # fuel but not in auxiliary, by default the auxiliaries of this simulator; they are not
+        # reported for fuels whose reaction reaches a cycle.
+        if auxiliary is None:
+            auxiliary = {name for name, material in self._materials.items() if isinstance(material, Auxiliary)}
+        shared = [name for name, material in self._materials.items() if len(material.parents) > 1]
+        report = ValidationReport([], shared, [], {})
+        finished = {}
+        cyclic = set()
+        # missing auxiliaries of the finished materials outside cycles, when there are some
+        missing = {}
+
+        def visit(root, from_fuel):
+            finished[root] = False
+            stack = [(root, iter(root._products.values()))]
+            if from_fuel and not root._products and not isinstance(root, Waste):
+                report.non_waste_leaves.append(root.name)
+            while stack:
+                material, products = stack[-1]
+                for prod, _ in products:
+                    if prod not in finished:
+                        finished[prod] = False
+                        stack.append((prod, iter(prod._products.values())))
+                        if from_fuel and not prod._products and not isinstance(prod, Waste):
+                            report.non_waste_leaves.append(prod.name)
+                        break
+                    if not finished[prod]:
+                        path = [entry[0] for entry in stack]
+                        report.cycles.append([mat.name for mat in path[path.index(prod):]])
+                        cyclic.add(material)
+                    elif prod in cyclic:
+                        cyclic.add(material)
+                else:
+                    stack.pop()
+                    finished[material] = True
+                    if material in cyclic:
+                        if stack:
+                            cyclic.add(stack[-1][0])
+                    else:
+                        combine_missing(material)
+
+        def combine_missing(material):
+            # missing auxiliaries in find_inconsistency order: the auxiliary of the material, then those
+            # of its products from the last to the first; a single contributing product shares its tuple
+            parts = []
+            if material._products and material.auxiliary is not None and material.auxiliary.name not in auxiliary:
+                parts.append((material.auxiliary.name,))
+            parts.extend(missing[prod] for prod, _ in reversed(material._products.values()) if prod in missing)
+            if len(parts) == 1:
+                missing[material] = parts[0]
+            elif parts:
+                missing[material] = tuple(dict.fromkeys(name for part in parts for name in part))
+
+        fuels = [material for material in self._materials.values() if isinstance(material, Fuel)]
+        for material in fuels:
+            if material not in finished:
+                visit(material, True)
+        for material in self._materials.values():
+            if material not in finished:
+                visit(material, False)
+        for fuel in fuels:
+            if fuel in missing:
+                report.missing_auxiliaries[fuel.name] = list(missing[fuel])
+        return report
 
     # R3
     def add_intermediate(self, product: str, intermediate: str, quantities: Tuple[float, float]) -> Optional[List[str]]:
-        intermediate = self._materials[intermediate]
-        product = self._materials[product]
-        for material in self._materials.values():
-            if product.name in [p.name for p, _ in material.products]:
-                material.remove_product(product.name)
-                material.add_product(intermediate, quantities[0])
+        self.add_intermediate_by_id(self._ids[product], self._ids[intermediate], quantities)
+
+    def add_intermediate_by_id(self, product: int, intermediate: int, quantities: Tuple[float, float]) -> None:
+        intermediate = self.get_material_by_id(intermediate)
+        product = self.get_material_by_id(product)
+        parents = product.parents
+        if parents:
+            # journaled as a single change
+            self._recording = False
+            try:
+                for material in parents:
+                    material._remove_product(product)
+                    material.add_product(intermediate, quantities[0])
                 intermediate.add_product(product, quantities[1])
-                return
-        
+            finally:
+                self._recording = True
+            self._changed("add_intermediate", (product.name, intermediate.name, tuple(quantities)))
+
     # R4
     def find_inconsistency(self, fuel: str, auxiliary: Set[str]) -> Optional[str]:
-        fuel = self._materials[fuel]
-        materials = [fuel]
-        inconsistency = None
-        while materials and not inconsistency:
-            mat = materials.pop()
-            if mat.products:
-                if mat.auxiliary is not None and mat.auxiliary.name not in auxiliary:
-                    inconsistency = mat.auxiliary.name
-                else:
-                    for mat, _ in mat.products:
-                        materials.append(mat)
-        return inconsistency
+        # the inventory is converted to ids once, the auxiliaries of this simulator are then compared by id
+        missing = self._inconsistency(self._by_id[self._ids[fuel]], {self._ids[name] for name in auxiliary
+                                                                     if name in self._ids}, auxiliary)
+        return None if missing is None else missing.name
+
+    def find_inconsistency_by_id(self, fuel: int, auxiliary: Set[int]) -> Optional[int]:
+        missing = self._inconsistency(self._by_id[fuel], auxiliary, None)
+        if missing is None:
+            return None
+        return missing.id if missing._owner is self else self._ids.get(missing.name, -1)
+
+    def _inconsistency(self, fuel, auxiliary, names):
+        # auxiliaries created by other simulators, or by none, have ids meaningless here and are
+        # compared by name; names is the inventory as names, built from the ids when needed
+        for material in fuel.required_auxiliary_materials:
+            if material._owner is self:
+                if material._id not in auxiliary:
+                    return material
+            else:
+                if names is None:
+                    names = {self._by_id[index].name for index in auxiliary if index in self._by_id}
+                if material.name not in names:
+                    return material
+        return None
+
+    def auxiliary_mask(self, auxiliary: Iterable[str]) -> int:
+        # inventory of auxiliaries as an integer bitset, for find_all_inconsistencies
+        mask = 0
+        for name in auxiliary:
+            mask |= 1 << self._auxiliary_bit(name)
+        return mask
+
+    def find_all_inconsistencies(self, fuel: str, auxiliary: Union[Set[str], int]) -> List[str]:
+        # every auxiliary required by the reaction and missing from auxiliary (names or auxiliary_mask),
+        # in the order in which find_inconsistency checks them
+        required = self._by_id[self._ids[fuel]].required_auxiliary_materials
+        cached = self._required_masks.get(fuel)
+        if cached is None or cached[0] is not required:
+            cached = (required, self.auxiliary_mask(material.name for material in required))
+            self._required_masks[fuel] = cached
+        if not isinstance(auxiliary, int):
+            auxiliary = self.auxiliary_mask(auxiliary)
+        missing = cached[1] & ~auxiliary
+        if not missing:
+            return []
+        names = (material.name for material in required)
+        return list(dict.fromkeys(name for name in names if missing >> self._auxiliary_bits[name] & 1))
+
+    def _auxiliary_bit(self, name):
+        bit = self._auxiliary_bits.get(name)
+        if bit is None:
+            bit = self._auxiliary_bits[name] = len(self._auxiliary_bits)
+        return bit
 
     # R5
     def simulate_reaction(self, fuel, quantity) -> Tuple[List[Tuple[str, float]], float, float]:
-        fuel = self._materials[fuel]
-        unused = []
-        energy, disposal = ReactorSimulator.recursive_sim(fuel, quantity, unused)
-        return unused, energy, disposal
+        return self.simulate_reaction_by_id(self._ids[fuel], quantity)
+
+    def simulate_reaction_by_id(self, fuel: int, quantity: float) -> Tuple[List[Tuple[str, float]], float, float]:
+        return self._scale(self._by_id[fuel].yields, quantity)
+
+    def required_quantity(self, fuel: str, energy_target: Optional[float] = None,
+                          max_disposal: Optional[float] = None) -> float:
+        # grams of fuel producing energy_target, or the most grams whose disposal stays within max_disposal
+        energy, disposal = self._materials[fuel].totals
+        if energy_target is not None:
+            if energy <= 0:
+                raise ReactorException("{} produces no energy".format(fuel))
+            quantity = energy_target / energy
+            if max_disposal is not None and quantity * disposal > max_disposal:
+                raise ReactorException("{} exceeds the disposal budget".format(fuel))
+            return quantity
+        if max_disposal is not None:
+            return max_disposal / disposal if disposal > 0 else float("inf")
+        raise ReactorException("Either an energy target or a disposal budget is required")
+
+    def required_quantities(self, fuels, energy_targets=None, max_disposals=None):
+        # vectorized required_quantity over fuels and targets (scalars or sequences broadcast together),
+        # with NaN where there is no solution
+        import numpy as np
+        totals = [self._materials[fuel].totals for fuel in fuels]
+        energy = np.array([fuel_energy for fuel_energy, _ in totals], dtype=float)
+        disposal = np.array([fuel_disposal for _, fuel_disposal in totals], dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if energy_targets is not None:
+                quantities = np.where(energy > 0, np.asarray(energy_targets, dtype=float) / energy, np.nan)
+                if max_disposals is not None:
+                    quantities = np.where(quantities * disposal > np.asarray(max_disposals, dtype=float),
+                                          np.nan, quantities)
+                return quantities
+            if max_disposals is not None:
+                return np.where(disposal > 0, np.asarray(max_disposals, dtype=float) / disposal, np.inf)
+        raise ReactorException("Either energy targets or disposal budgets are required")
+
+    def optimize_fuel_mix(self, demand: float, auxiliary: Set[str],
+                          availability: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        # Cheapest grams of each fuel producing demand energy, cost being price plus disposal. Only fuels
+        # whose auxiliaries are all available are used, each at most availability[fuel] grams if given.
+        # With a single energy constraint the linear program is solved exactly by filling the demand
+        # with the fuels in order of cost per unit of energy.
+        candidates = []
+        for name, material in self._materials.items():
+            if not isinstance(material, Fuel) or self.find_inconsistency(name, auxiliary) is not None:
+                continue
+            energy, disposal = material.totals
+            if energy > 0:
+                candidates.append(((material.price + disposal) / energy, name, energy))
+        candidates.sort()
+        mix = {}
+        remaining = demand
+        for _, name, energy in candidates:
+            if remaining <= 0:
+                break
+            quantity = remaining / energy
+            if availability is not None and availability.get(name, quantity) < quantity:
+                quantity = availability[name]
+                remaining -= quantity * energy
+            else:
+                # the fuel covers the rest of the demand, whatever the rounding of quantity * energy
+                remaining = 0
+            if quantity > 0:
+                mix[name] = quantity
+        if remaining > 1e-9 * demand:
+            raise ReactorException("Energy demand cannot be met by the available fuels")
+        return mix
+
+    def sensitivities(self, fuel, quantity) -> Sensitivity:
+        # energy and disposal are linear in each yield: the derivative for the edge (material, product)
+        # is the quantity of material reached times the per-gram energy or disposal of product
+        result = Sensitivity({}, {}, {}, {})
+        order = self._materials[fuel].topological_order()
+        reached = {order[0]: quantity}
+        for material in order:
+            products = material._products.values()
+            result.energy[material.name] = reached[material] if products else 0
+            result.disposal[material.name] = 0 if products else reached[material]
+            for prod, qt in products:
+                prod_energy, prod_disposal = prod.totals
+                result.edge_energy[material.name, prod.name] = reached[material] * prod_energy
+                result.edge_disposal[material.name, prod.name] = reached[material] * prod_disposal
+                reached[prod] = reached.get(prod, 0) + qt * reached[material]
+        return result
+
+    def simulate_steps(self, fuel, quantity) -> Iterator[ReactionStep]:
+        # simulate_reaction one generation at a time, keeping only the current generation in memory
+        energy = 0
+        disposal = 0
+        depth = 0
+        generation = {self._materials[fuel]: quantity}
+        while generation:
+            # a material reached through several products at the same depth appears once
+            following = {}
+            for material, reached in generation.items():
+                if material._products:
+                    energy += material.energy * reached
+                    for prod, qt in material._products.values():
+                        following[prod] = following.get(prod, 0) + qt * reached
+                else:
+                    disposal += material.disposal_cost * reached
+            yield ReactionStep(depth, [(material.name, reached) for material, reached in generation.items()],
+                               energy, disposal)
+            generation = following
+            depth += 1
+
+    def simulate_reactions(self, fuel, quantities):
+        # vectorized simulate_reaction: returns the names of the unused waste, a matrix with one row of
+        # unused quantities per input quantity, and the arrays of energies and disposal costs
+        import numpy as np
+        unused, energy, disposal = self._materials[fuel].yields
+        quantities = np.asarray(quantities, dtype=float)
+        names = [name for name, _ in unused]
+        per_gram = np.fromiter((qt for _, qt in unused), dtype=float, count=len(unused))
+        return names, np.outer(quantities, per_gram), energy * quantities, disposal * quantities
+
+    def simulate_many(self, jobs, workers=None) -> List[Tuple[List[Tuple[str, float]], float, float]]:
+        # simulate_reaction for each (fuel, quantity) job, results in input order. The per-gram results
+        # of the fuels not cached yet are computed on the process pool of the simulator.
+        jobs = list(jobs)
+        cold = [fuel for fuel in dict.fromkeys(fuel for fuel, _ in jobs) if self._materials[fuel]._unused is None]
+        yields = self._workers(workers).yields(self, cold) if workers != 1 and len(cold) > 1 else {}
+        return [self._scale(yields[fuel] if fuel in yields else self._materials[fuel].yields, quantity)
+                for fuel, quantity in jobs]
+
+    def simulate_reaction_parallel(self, fuel, quantity, workers=None) -> Tuple[List[Tuple[str, float]], float, float]:
+        # simulate_reaction with the subtrees of the products of the fuel evaluated on the process pool
+        # of the simulator, for the queries of a large fuel whose yields are not cached yet
+        material = self._materials[fuel]
+        if material._unused is not None or workers == 1 or len(material._products) < 2:
+            return self.simulate_reaction(fuel, quantity)
+        return self._scale(self._workers(workers).combined_yields(self, material), quantity)
+
+    def shutdown_workers(self) -> None:
+        # stops the process pool of simulate_many, started again when needed
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _workers(self, workers):
+        workers = workers or os.cpu_count() or 1
+        if self._pool is None or self._pool.workers != workers:
+            self.shutdown_workers()
+            self._pool = parallel.Pool(self, workers)
+        return self._pool
+
+    @staticmethod
+    def _scale(yields, quantity):
+        unused, energy, disposal = yields
+        return [(name, qt * quantity) for name, qt in unused], energy * quantity, disposal * quantity
 
     @staticmethod
     def recursive_sim(material, quantity, unused):
@@ -66,3 +535,20 @@ class ReactorSimulator:
                 disposal += disposal_prod
             energy += material.energy * quantity
         return energy, disposal
+
+    @staticmethod
+    def iterative_sim(material, quantity, unused):
+        # same result and unused ordering as recursive_sim, without one Python frame per tree level;
+        # like recursive_sim it follows every path, so shared products are visited once per path
+        energy = 0
+        disposal = 0
+        stack = [(material, quantity)]
+        while stack:
+            material, quantity = stack.pop()
+            if not material.products:
+                unused.append((material.name, quantity))
+                disposal += material.disposal_cost * quantity
+            else:
+                energy += material.energy * quantity
+                stack.extend((prod, qt*quantity) for prod, qt in reversed(material.products))
+        return energy, disposal
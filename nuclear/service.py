@@ -0,0 +1,36 @@
+import asyncio
+from typing import List, Optional, Set, Tuple
+from nuclear.reactor import ReactorSimulator
+
+
+class AsyncReactorSimulator:
+    # Runs the queries of a ReactorSimulator on an executor. Identical queries issued while one is
+    # still running on the same version of the simulator share its result (and the returned objects).
+    # The simulator must not be changed while queries are running.
+    def __init__(self, simulator: ReactorSimulator, executor=None):
+        self._simulator = simulator
+        self._executor = executor
+        self._running = {}
+
+    @property
+    def simulator(self) -> ReactorSimulator:
+        return self._simulator
+
+    async def simulate_reaction(self, fuel: str, quantity: float) -> Tuple[List[Tuple[str, float]], float, float]:
+        return await self._coalesce(("simulate_reaction", fuel, quantity), self._simulator.simulate_reaction,
+                                    fuel, quantity)
+
+    async def find_inconsistency(self, fuel: str, auxiliary: Set[str]) -> Optional[str]:
+        auxiliary = frozenset(auxiliary)
+        return await self._coalesce(("find_inconsistency", fuel, auxiliary), self._simulator.find_inconsistency,
+                                    fuel, auxiliary)
+
+    async def _coalesce(self, query, function, *args):
+        key = query + (self._simulator.version,)
+        future = self._running.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+            self._running[key] = future
+            future.add_done_callback(lambda _: self._running.pop(key, None))
+        # a cancelled caller must not cancel the computation shared with the others
+        return await asyncio.shield(future)
@@ -1,6 +1,15 @@
 import unittest
-from nuclear.materials import Material
-from nuclear.reactor import ReactorSimulator
+import asyncio
+import importlib.util
+import threading
+import json
+import os
+import tempfile
+from nuclear.materials import Material, NuclearMaterial, Fuel, Auxiliary
+from nuclear.reactor import ReactorSimulator, Change
+from nuclear.compiled import CompiledReactor
+from nuclear.service import AsyncReactorSimulator
+from nuclear.instrumentation import Instrumentation
 from nuclear.errors import ReactorException
 
 
@@ -64,6 +73,27 @@ class TestR1(unittest.TestCase):
         self.assertEqual("Waste2", self._rs.get_material("Waste2").name)
         self.assertEqual("Aux2", self._rs.get_material("Aux2").name)
 
+    def test_no_instance_dict(self):
+        self._rs.add_fuel("Fuel1", 1, 2)
+        self._rs.add_waste("Waste1", 3, 4)
+        self._rs.add_auxiliary("Aux1")
+        for name in ["Fuel1", "Waste1", "Aux1"]:
+            self.assertFalse(hasattr(self._rs.get_material(name), "__dict__"))
+
+    def test_containers_created_on_use(self):
+        self._rs.add_fuel("Fuel1", 1, 2)
+        self._rs.add_waste("Waste1", 3, 4)
+        fuel, waste = self._rs.get_material("Fuel1"), self._rs.get_material("Waste1")
+        self.assertIs(fuel._products, waste._products)
+        self.assertIs(fuel._parents, waste._parents)
+        fuel.add_product(waste, 1)
+        self.assertIsNot(fuel._products, waste._products)
+        self.assertEqual([fuel], waste.parents)
+        self.assertEqual([], waste.products)
+        fuel.remove_product("Waste1")
+        self.assertEqual([], fuel.products)
+        self.assertEqual([], waste.parents)
+
     def test_add_multiple_properties(self):
         self._rs.add_fuel("Fuel1", 1, 2)
         self._rs.add_waste("Waste1", 3, 4)
@@ -162,6 +192,22 @@ class TestR2(unittest.TestCase):
         self.assertEqual("Waste2", fuel2.products[0][0].name)
         self.assertAlmostEqual(0.2, fuel2.products[0][1])
 
+    def test_product_index(self):
+        fuel1 = self._rs.get_material("Fuel1")
+        fuel1.add_product(self._rs.get_material("Fuel2"), 0.5)
+        fuel1.add_product(self._rs.get_material("Waste1"), 0.2)
+        fuel1.add_product(self._rs.get_material("Waste2"), 0.1)
+
+        fuel1.add_product(self._rs.get_material("Fuel2"), 0.3)
+        self.assertEqual([("Fuel2", 0.3), ("Waste1", 0.2), ("Waste2", 0.1)],
+                         [(prod.name, qt) for prod, qt in fuel1.products])
+
+        fuel1.remove_product("Waste1")
+        self.assertTrue(fuel1.has_product("Waste2"))
+        self.assertFalse(fuel1.has_product("Waste1"))
+        self.assertEqual(["Fuel2", "Waste2"], [prod.name for prod, _ in fuel1.products])
+        self.assertIsNone(self._rs.get_material("Waste1").parent)
+
 
 class TestR3(unittest.TestCase):
 
@@ -203,6 +249,25 @@ class TestR3(unittest.TestCase):
         prod, qt = [(prod, qt) for prod, qt in self._rs.get_material("Fuel1").products if prod.name == "Waste3"][0]       
         self.assertAlmostEqual(0.4, qt)
 
+    def test_intermediate_parent(self):
+        self._rs.add_intermediate("Fuel2", "Waste3", (0.4, 0.7))
+        self.assertEqual("Waste3", self._rs.get_material("Fuel2").parent.name)
+        self.assertEqual("Fuel1", self._rs.get_material("Waste3").parent.name)
+        self.assertIsNone(self._rs.get_material("Fuel1").parent)
+
+    def test_intermediate_root(self):
+        self._rs.add_intermediate("Fuel1", "Waste3", (0.4, 0.7))
+        self.assertEqual([], self._rs.get_material("Waste3").products)
+        self.assertIsNone(self._rs.get_material("Fuel1").parent)
+
+    def test_intermediate_bulk(self):
+        for i in range(2000):
+            self._rs.add_fuel("Int{}".format(i), 1, 1)
+            self._rs.add_intermediate("Waste1", "Int{}".format(i), (1, 1))
+        self.assertEqual("Int1999", self._rs.get_material("Waste1").parent.name)
+        self.assertEqual("Int0", self._rs.get_material("Int1").parent.name)
+        self.assertEqual("Fuel1", self._rs.get_material("Int0").parent.name)
+
 
 class TestR4(unittest.TestCase):
 
@@ -277,6 +342,59 @@ class TestR4(unittest.TestCase):
         self.assertEqual("Aux2", self._rs.find_inconsistency("Fuel1", {"Aux1", "Aux3"}))
         self.assertIsNone(self._rs.find_inconsistency("Fuel1", {"Aux1", "Aux2", "Aux3"}))
 
+    def test_inconsistency_cache(self):
+        self._fuel1.set_auxiliary(self._aux1)
+        self._fuel1.add_product(self._fuel2, 1)
+        self._fuel2.add_product(self._waste1, 2)
+        self.assertIsNone(self._rs.find_inconsistency("Fuel1", {"Aux1"}))
+
+        self._fuel2.set_auxiliary(self._aux2)
+        self.assertEqual("Aux2", self._rs.find_inconsistency("Fuel1", {"Aux1"}))
+
+        self._waste1.set_auxiliary(self._aux3)
+        self._waste1.add_product(self._waste2, 1)
+        self.assertEqual("Aux3", self._rs.find_inconsistency("Fuel1", {"Aux1", "Aux2"}))
+
+        self._fuel2.remove_product("Waste1")
+        self.assertIsNone(self._rs.find_inconsistency("Fuel1", {"Aux1", "Aux2"}))
+
+    def test_inconsistency_order(self):
+        self._fuel1.set_auxiliary(self._aux1)
+        self._fuel2.set_auxiliary(self._aux2)
+        self._waste1.set_auxiliary(self._aux3)
+        self._waste2.set_auxiliary(self._aux4)
+        self._waste3.set_auxiliary(self._aux5)
+
+        self._fuel1.add_product(self._fuel2, 1)
+        self._fuel1.add_product(self._waste1, 1)
+        self._fuel2.add_product(self._waste2, 1)
+        self._waste1.add_product(self._waste3, 1)
+        self._waste2.add_product(self._rs.get_material("Aux1"), 1)
+        self._waste3.add_product(self._rs.get_material("Aux2"), 1)
+
+        self.assertEqual(("Aux1", "Aux3", "Aux5", "Aux2", "Aux4"), self._fuel1.required_auxiliaries)
+        self.assertEqual("Aux5", self._rs.find_inconsistency("Fuel1", {"Aux1", "Aux2", "Aux3", "Aux4"}))
+
+    def test_all_inconsistencies(self):
+        self._fuel1.set_auxiliary(self._aux1)
+        self._fuel2.set_auxiliary(self._aux2)
+        self._waste1.set_auxiliary(self._aux3)
+        self._waste3.set_auxiliary(self._aux5)
+
+        self._fuel1.add_product(self._fuel2, 1)
+        self._fuel1.add_product(self._waste1, 1)
+        self._fuel2.add_product(self._waste2, 1)
+        self._waste1.add_product(self._waste3, 1)
+        self._waste3.add_product(self._rs.get_material("Aux2"), 1)
+
+        self.assertEqual(["Aux1", "Aux3", "Aux5", "Aux2"], self._rs.find_all_inconsistencies("Fuel1", set()))
+        self.assertEqual(["Aux5"], self._rs.find_all_inconsistencies("Fuel1", {"Aux1", "Aux2", "Aux3", "Aux4"}))
+        mask = self._rs.auxiliary_mask({"Aux1", "Aux2", "Aux3", "Aux5"})
+        self.assertEqual([], self._rs.find_all_inconsistencies("Fuel1", mask))
+
+        self._fuel2.set_auxiliary(self._aux4)
+        self.assertEqual(["Aux4"], self._rs.find_all_inconsistencies("Fuel1", mask))
+
 
 class TestR5(unittest.TestCase):
 
@@ -323,4 +441,897 @@ class TestR5(unittest.TestCase):
     def test_simulation_disposal(self):
         _, _, disposal = self._rs.simulate_reaction("Fuel1", 32.5)
         self.assertAlmostEqual(32.5*0.4*7 + 32.5*0.1*0.7*6 + 32.5*0.5*0.6*5, disposal)
-    
\ No newline at end of file
+    
+    def test_sensitivities(self):
+        result = self._rs.sensitivities("Fuel1", 32.5)
+        self.assertAlmostEqual(32.5*0.6*5, result.edge_disposal["Fuel1", "Fuel2"])
+        self.assertAlmostEqual(32.5*(9 + 0), result.edge_energy["Fuel1", "Fuel2"])
+        self.assertAlmostEqual(32.5*0.5*5, result.edge_disposal["Fuel2", "Waste3"])
+        self.assertAlmostEqual(0, result.edge_energy["Fuel2", "Waste3"])
+        self.assertAlmostEqual(32.5*0.1, result.energy["Fuel3"])
+        self.assertAlmostEqual(32.5*0.1*0.7, result.disposal["Waste2"])
+        self.assertAlmostEqual(0, result.energy["Waste2"])
+
+    def test_sensitivities_finite_difference(self):
+        _, energy, disposal = self._rs.simulate_reaction("Fuel1", 32.5)
+        result = self._rs.sensitivities("Fuel1", 32.5)
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Fuel3"), 0.1 + 1e-6)
+        _, new_energy, new_disposal = self._rs.simulate_reaction("Fuel1", 32.5)
+        self.assertAlmostEqual(result.edge_energy["Fuel1", "Fuel3"], (new_energy - energy) / 1e-6, places=3)
+        self.assertAlmostEqual(result.edge_disposal["Fuel1", "Fuel3"], (new_disposal - disposal) / 1e-6, places=3)
+
+    def test_required_quantity(self):
+        _, energy, disposal = self._rs.simulate_reaction("Fuel1", 32.5)
+        self.assertAlmostEqual(32.5, self._rs.required_quantity("Fuel1", energy_target=energy))
+        self.assertAlmostEqual(32.5, self._rs.required_quantity("Fuel1", max_disposal=disposal))
+        self.assertAlmostEqual(32.5, self._rs.required_quantity("Fuel1", energy, disposal + 1))
+        self.assertRaises(ReactorException, self._rs.required_quantity, "Fuel1", energy, disposal - 1)
+        self.assertRaises(ReactorException, self._rs.required_quantity, "Fuel1")
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy not installed")
+    def test_required_quantities(self):
+        fuels = ["Fuel1", "Fuel2", "Fuel3"]
+        quantities = self._rs.required_quantities(fuels, energy_targets=[100, 200, 300], max_disposals=[60, 70, 100])
+        self.assertAlmostEqual(self._rs.required_quantity("Fuel1", 100), quantities[0])
+        self.assertAlmostEqual(self._rs.required_quantity("Fuel2", 200), quantities[1])
+        self.assertTrue(quantities[2] != quantities[2])
+        budgets = self._rs.required_quantities(fuels, max_disposals=[10, 20, 30])
+        self.assertAlmostEqual(self._rs.required_quantity("Fuel3", max_disposal=30), budgets[2])
+
+    def test_optimize_fuel_mix(self):
+        # cost per unit of energy: Fuel1 (1 + 4.72) / 15.3, Fuel2 (1 + 3) / 9, Fuel3 (1 + 4.2) / 8
+        self._rs.get_material("Fuel1").set_auxiliary(self._rs.get_material("Waste4"))
+        self.assertEqual({"Fuel1": 100 / 15.3}, self._rs.optimize_fuel_mix(100, {"Waste4"}))
+        self.assertEqual({"Fuel2": 100 / 9}, self._rs.optimize_fuel_mix(100, set()))
+
+        mix = self._rs.optimize_fuel_mix(100, set(), {"Fuel2": 5})
+        self.assertEqual(5, mix["Fuel2"])
+        self.assertAlmostEqual((100 - 5*9) / 8, mix["Fuel3"])
+        self.assertRaises(ReactorException, self._rs.optimize_fuel_mix, 100, set(), {"Fuel2": 5, "Fuel3": 1})
+
+    def test_optimize_large_demand(self):
+        # demand - demand / 41.9 * 41.9 is far above any absolute tolerance at this scale
+        rs = ReactorSimulator()
+        rs.add_fuel("Fuel1", 41.9, 1)
+        rs.add_fuel("Fuel2", 1, 1)
+        rs.add_waste("Waste1", 0, 1)
+        rs.get_material("Fuel1").add_product(rs.get_material("Waste1"), 1)
+        rs.get_material("Fuel2").add_product(rs.get_material("Waste1"), 1)
+        demand = 8459776330097.977
+        self.assertEqual({"Fuel1": demand / 41.9}, rs.optimize_fuel_mix(demand, set()))
+        self.assertEqual({"Fuel1": demand / 41.9}, rs.optimize_fuel_mix(demand, set(), {"Fuel1": demand / 41.9}))
+        mix = rs.optimize_fuel_mix(demand, set(), {"Fuel1": demand / 83.8})
+        self.assertAlmostEqual(demand / 2, mix["Fuel2"], delta=demand * 1e-12)
+        self.assertRaises(ReactorException, rs.optimize_fuel_mix, demand, set(), {"Fuel1": 1, "Fuel2": 1})
+
+    def test_simulation_steps(self):
+        steps = list(self._rs.simulate_steps("Fuel1", 32.5))
+        self.assertEqual([0, 1, 2], [step.depth for step in steps])
+        self.assertEqual([("Fuel1", 32.5)], steps[0].materials)
+        self.assertEqual(["Fuel2", "Waste1", "Fuel3"], [name for name, _ in steps[1].materials])
+        self.assertEqual(["Waste3", "Waste2"], [name for name, _ in steps[2].materials])
+        self.assertAlmostEqual(32.5*10, steps[0].energy)
+        self.assertAlmostEqual(32.5*0.4*7, steps[1].disposal)
+        _, energy, disposal = self._rs.simulate_reaction("Fuel1", 32.5)
+        self.assertAlmostEqual(energy, steps[-1].energy)
+        self.assertAlmostEqual(disposal, steps[-1].disposal)
+
+
+class TestYieldCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_fuel("Fuel2", 9, 1)
+        self._rs.add_fuel("Fuel3", 8, 1)
+        self._rs.add_waste("Waste1", 1, 7)
+        self._rs.add_waste("Waste2", 1, 6)
+
+        self._fuel1 = self._rs.get_material("Fuel1")
+        self._fuel2 = self._rs.get_material("Fuel2")
+        self._fuel3 = self._rs.get_material("Fuel3")
+        self._waste1 = self._rs.get_material("Waste1")
+        self._waste2 = self._rs.get_material("Waste2")
+
+        self._fuel1.add_product(self._fuel2, 0.5)
+        self._fuel2.add_product(self._waste1, 0.6)
+
+    def tearDown(self) -> None:
+        self._rs.shutdown_workers()
+
+    def test_matches_recursive(self):
+        expected = []
+        energy, disposal = ReactorSimulator.recursive_sim(self._fuel1, 12, expected)
+        residual, sim_energy, sim_disposal = self._rs.simulate_reaction("Fuel1", 12)
+        self.assertEqual([name for name, _ in expected], [name for name, _ in residual])
+        for (_, qt), (_, sim_qt) in zip(expected, residual):
+            self.assertAlmostEqual(qt, sim_qt)
+        self.assertAlmostEqual(energy, sim_energy)
+        self.assertAlmostEqual(disposal, sim_disposal)
+
+    def test_iterative_matches_recursive(self):
+        self._fuel1.add_product(self._fuel3, 0.2)
+        self._fuel3.add_product(self._waste2, 0.9)
+        expected, unused = [], []
+        energy, disposal = ReactorSimulator.recursive_sim(self._fuel1, 12, expected)
+        it_energy, it_disposal = ReactorSimulator.iterative_sim(self._fuel1, 12, unused)
+        self.assertEqual(expected, unused)
+        self.assertAlmostEqual(energy, it_energy)
+        self.assertAlmostEqual(disposal, it_disposal)
+
+    def test_invalidate_add_product(self):
+        self._rs.simulate_reaction("Fuel1", 10)
+        self._fuel2.add_product(self._waste2, 0.2)
+        residual, _, disposal = self._rs.simulate_reaction("Fuel1", 10)
+        self.assertEqual(["Waste1", "Waste2"], [name for name, _ in residual])
+        self.assertAlmostEqual(10*0.5*0.6*7 + 10*0.5*0.2*6, disposal)
+
+    def test_invalidate_intermediate(self):
+        self._rs.simulate_reaction("Fuel1", 10)
+        self._rs.add_intermediate("Waste1", "Fuel3", (0.3, 0.4))
+        residual, energy, _ = self._rs.simulate_reaction("Fuel1", 10)
+        self.assertAlmostEqual(10*0.5*0.3*0.4, residual[0][1])
+        self.assertAlmostEqual(10*10 + 10*0.5*9 + 10*0.5*0.3*8, energy)
+
+    def test_invalidate_every_parent(self):
+        self._fuel3.add_product(self._waste1, 0.5)
+        self._rs.simulate_reaction("Fuel1", 10)
+        self._rs.simulate_reaction("Fuel3", 10)
+        self._waste1.add_product(self._waste2, 1)
+        residual, energy, disposal = self._rs.simulate_reaction("Fuel1", 10)
+        self.assertEqual(["Waste2"], [name for name, _ in residual])
+        self.assertAlmostEqual(10*10 + 10*0.5*9 + 10*0.5*0.6*1, energy)
+        self.assertAlmostEqual(10*0.5*0.6*6, disposal)
+        self.assertEqual([("Waste2", 5.0)], self._rs.simulate_reaction("Fuel3", 10)[0])
+
+    def test_waste_at_every_level(self):
+        rs = ReactorSimulator()
+        depth = 8000
+        for i in range(depth):
+            rs.add_fuel("Fuel{}".format(i), 1, 1)
+            rs.add_waste("Waste{}".format(i), 0, 1)
+        for i in range(depth):
+            fuel = rs.get_material("Fuel{}".format(i))
+            fuel.add_product(rs.get_material("Waste{}".format(i)), 0.5)
+            if i + 1 < depth:
+                fuel.add_product(rs.get_material("Fuel{}".format(i + 1)), 1)
+        expected = []
+        energy, disposal = ReactorSimulator.iterative_sim(rs.get_material("Fuel0"), 2, expected)
+        self.assertEqual((expected, energy, disposal), rs.simulate_reaction("Fuel0", 2))
+        self.assertEqual(depth, len(expected))
+        rs.get_material("Waste{}".format(depth - 1)).add_product(rs.get_material("Waste0"), 1)
+        residual, _, _ = rs.simulate_reaction("Fuel0", 2)
+        self.assertEqual(("Waste0", 2.0), residual[0])
+        self.assertEqual(depth - 1, len(residual))
+        residual, _, _ = rs.simulate_reaction("Fuel1", 1)
+        self.assertEqual([("Waste1", 0.5), ("Waste0", 0.5)], [residual[0], residual[-1]])
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy not installed")
+    def test_batched(self):
+        quantities = [0, 1.5, 12, 40]
+        names, unused, energy, disposal = self._rs.simulate_reactions("Fuel1", quantities)
+        self.assertEqual((4, 1), unused.shape)
+        for i, quantity in enumerate(quantities):
+            residual, sim_energy, sim_disposal = self._rs.simulate_reaction("Fuel1", quantity)
+            self.assertEqual([name for name, _ in residual], names)
+            self.assertAlmostEqual(residual[0][1], unused[i, 0])
+            self.assertAlmostEqual(sim_energy, energy[i])
+            self.assertAlmostEqual(sim_disposal, disposal[i])
+
+    def test_simulate_many(self):
+        self._fuel1.add_product(self._fuel3, 0.2)
+        self._fuel3.add_product(self._waste2, 0.9)
+        jobs = [("Fuel1", 12), ("Fuel3", 2.5), ("Fuel2", 0), ("Fuel1", 7)]
+        results = self._rs.simulate_many(jobs, workers=2)
+        self.assertEqual(len(jobs), len(results))
+        for (fuel, quantity), (residual, energy, disposal) in zip(jobs, results):
+            expected, exp_energy, exp_disposal = self._rs.simulate_reaction(fuel, quantity)
+            self.assertEqual([name for name, _ in expected], [name for name, _ in residual])
+            for (_, qt), (_, exp_qt) in zip(residual, expected):
+                self.assertAlmostEqual(exp_qt, qt)
+            self.assertAlmostEqual(exp_energy, energy)
+            self.assertAlmostEqual(exp_disposal, disposal)
+
+    def test_simulate_parallel(self):
+        self._fuel1.add_product(self._fuel3, 0.2)
+        self._fuel3.add_product(self._waste2, 0.9)
+        residual, energy, disposal = self._rs.simulate_reaction_parallel("Fuel1", 12, workers=2)
+        expected, exp_energy, exp_disposal = self._rs.simulate_reaction("Fuel1", 12)
+        self.assertEqual([name for name, _ in expected], [name for name, _ in residual])
+        for (_, qt), (_, exp_qt) in zip(residual, expected):
+            self.assertAlmostEqual(exp_qt, qt)
+        self.assertAlmostEqual(exp_energy, energy)
+        self.assertAlmostEqual(exp_disposal, disposal)
+
+    def test_pool_kept_across_versions(self):
+        self._fuel1.add_product(self._fuel3, 0.2)
+        self._fuel3.add_product(self._waste2, 0.9)
+        self._rs.simulate_many([("Fuel2", 1), ("Fuel3", 1)], workers=2)
+        pool = self._rs._pool
+        self._rs.simulate_reaction_parallel("Fuel1", 1, workers=2)
+        self._fuel3.add_product(self._waste1, 0.1)
+        residual, energy, _ = self._rs.simulate_reaction_parallel("Fuel1", 10, workers=2)
+        self.assertEqual(["Waste1", "Waste2"], [name for name, _ in residual])
+        self.assertAlmostEqual(10*0.5*0.6 + 10*0.2*0.1, residual[0][1])
+        self.assertAlmostEqual(10*10 + 10*0.5*9 + 10*0.2*8, energy)
+        self.assertEqual(["Waste2", "Waste1"], [name for name, _ in self._rs.simulate_many(
+            [("Fuel2", 10), ("Fuel3", 10)], workers=2)[1][0]])
+        self.assertIs(pool, self._rs._pool)
+        self._rs.shutdown_workers()
+        self.assertIsNone(self._rs._pool)
+
+
+class TestDeepChain(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        self._depth = 100000
+        for i in range(self._depth):
+            self._rs.add_fuel("Fuel{}".format(i), 1, 1)
+        self._rs.add_waste("Waste", 1, 2)
+        for i in range(self._depth - 1):
+            self._rs.get_material("Fuel{}".format(i)).add_product(self._rs.get_material("Fuel{}".format(i + 1)), 1)
+        self._rs.get_material("Fuel{}".format(self._depth - 1)).add_product(self._rs.get_material("Waste"), 1)
+
+    def test_simulation_deep(self):
+        residual, energy, disposal = self._rs.simulate_reaction("Fuel0", 2)
+        self.assertEqual([("Waste", 2)], residual)
+        self.assertAlmostEqual(2*self._depth, energy)
+        self.assertAlmostEqual(4, disposal)
+
+    def test_waste_at_every_level_deep(self):
+        rs = ReactorSimulator()
+        for i in range(self._depth):
+            rs.add_fuel("Fuel{}".format(i), 1, 1)
+            rs.add_waste("Waste{}".format(i), 0, 1)
+        for i in range(self._depth):
+            fuel = rs.get_material("Fuel{}".format(i))
+            fuel.add_product(rs.get_material("Waste{}".format(i)), 0.5)
+            if i + 1 < self._depth:
+                fuel.add_product(rs.get_material("Fuel{}".format(i + 1)), 1)
+        residual, energy, disposal = rs.simulate_reaction("Fuel0", 2)
+        self.assertEqual(["Waste{}".format(i) for i in range(self._depth)], [name for name, _ in residual])
+        self.assertEqual({1.0}, {qt for _, qt in residual})
+        self.assertAlmostEqual(2*self._depth, energy)
+        self.assertAlmostEqual(self._depth, disposal)
+
+    def test_auxiliaries_deep(self):
+        for i in range(self._depth):
+            self._rs.add_auxiliary("Aux{}".format(i))
+            self._rs.get_material("Fuel{}".format(i)).set_auxiliary(self._rs.get_material("Aux{}".format(i)))
+        required = self._rs.get_material("Fuel0").required_auxiliaries
+        self.assertEqual(["Aux{}".format(i) for i in range(self._depth)], list(required))
+        self.assertEqual("Aux{}".format(self._depth - 1), self._rs.find_inconsistency("Fuel0", set(required[:-1])))
+        report = self._rs.validate(set(required[:-1]))
+        self.assertEqual(self._depth, len(report.missing_auxiliaries))
+        self.assertEqual(["Aux{}".format(self._depth - 1)], report.missing_auxiliaries["Fuel0"])
+        self._rs.get_material("Fuel{}".format(self._depth - 1)).set_auxiliary(None)
+        self.assertIsNone(self._rs.find_inconsistency("Fuel0", set(required[:-1])))
+
+    def test_iterative_deep(self):
+        unused = []
+        energy, disposal = ReactorSimulator.iterative_sim(self._rs.get_material("Fuel0"), 2, unused)
+        self.assertEqual([("Waste", 2)], unused)
+        self.assertAlmostEqual(2*self._depth, energy)
+        self.assertAlmostEqual(4, disposal)
+
+
+class TestCompiled(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_fuel("Fuel2", 9, 1)
+        self._rs.add_fuel("Fuel3", 8, 1)
+        self._rs.add_waste("Waste1", 1, 7)
+        self._rs.add_waste("Waste2", 1, 6)
+        self._rs.add_waste("Waste3", 1, 5)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.add_auxiliary("Aux2")
+
+        fuel1 = self._rs.get_material("Fuel1")
+        fuel2 = self._rs.get_material("Fuel2")
+        fuel3 = self._rs.get_material("Fuel3")
+
+        fuel1.add_product(fuel2, 0.5)
+        fuel1.add_product(self._rs.get_material("Waste1"), 0.4)
+        fuel1.add_product(fuel3, 0.1)
+        fuel2.add_product(self._rs.get_material("Waste3"), 0.6)
+        fuel3.add_product(self._rs.get_material("Waste2"), 0.7)
+        fuel1.set_auxiliary(self._rs.get_material("Aux1"))
+        fuel3.set_auxiliary(self._rs.get_material("Aux2"))
+
+    def test_compiled_simulation(self):
+        compiled = self._rs.compile()
+        residual, energy, disposal = compiled.simulate_reaction("Fuel1", 32.5)
+        expected, exp_energy, exp_disposal = self._rs.simulate_reaction("Fuel1", 32.5)
+        self.assertEqual([name for name, _ in expected], [name for name, _ in residual])
+        for (_, qt), (_, exp_qt) in zip(residual, expected):
+            self.assertAlmostEqual(exp_qt, qt)
+        self.assertAlmostEqual(exp_energy, energy)
+        self.assertAlmostEqual(exp_disposal, disposal)
+
+    def test_non_waste_leaf(self):
+        self._rs.add_fuel("Fuel4", 3, 1)
+        self._rs.get_material("Fuel3").add_product(self._rs.get_material("Fuel4"), 0.2)
+        compiled = self._rs.compile()
+        for engine in (self._rs, compiled):
+            with self.assertRaisesRegex(ReactorException, "Fuel4"):
+                engine.simulate_reaction("Fuel1", 1)
+        self.assertEqual([("Waste3", 0.6)], compiled.simulate_reaction("Fuel2", 1)[0])
+
+    def test_compiled_inconsistency(self):
+        compiled = self._rs.compile()
+        self.assertEqual("Aux1", compiled.find_inconsistency("Fuel1", {"Aux2"}))
+        self.assertEqual("Aux2", compiled.find_inconsistency("Fuel1", {"Aux1"}))
+        self.assertIsNone(compiled.find_inconsistency("Fuel1", {"Aux1", "Aux2"}))
+
+    def test_compiled_frozen(self):
+        compiled = self._rs.compile()
+        self._rs.add_fuel("Fuel4", 3, 1)
+        self._rs.add_intermediate("Waste1", "Fuel4", (0.3, 0.4))
+        self.assertEqual(8, len(compiled))
+        self.assertEqual(3, len(compiled.simulate_reaction("Fuel1", 1)[0]))
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "reactor.snapshot")
+            compiled = self._rs.compile()
+            self._rs.save_snapshot(path)
+            mapped = CompiledReactor.load(path)
+            self.assertEqual(compiled.names, mapped.names)
+            self.assertEqual(compiled.simulate_reaction("Fuel1", 32.5), mapped.simulate_reaction("Fuel1", 32.5))
+            self.assertEqual(compiled.simulate_reaction("Fuel3", 2), mapped.simulate_reaction("Fuel3", 2))
+            self.assertEqual("Aux2", mapped.find_inconsistency("Fuel1", {"Aux1"}))
+            self.assertRaises(KeyError, mapped.simulate_reaction, "Fuel4", 1)
+
+    def test_invalid_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "reactor.snapshot")
+            self._rs.save_snapshot(path)
+            with open(path, "rb") as f:
+                data = f.read()
+            for content in [b"", data[:10], data[:-1], data + b"\0", b"XXXX" + data[4:]]:
+                with open(path, "wb") as f:
+                    f.write(content)
+                self.assertRaises(ReactorException, CompiledReactor.load, path)
+
+
+class TestCatalogue(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._rs = ReactorSimulator()
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _write(self, name, lines):
+        path = os.path.join(self._dir.name, name)
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def test_load_csv(self):
+        path = self._write("catalogue.csv", [
+            "kind,name,value1,value2",
+            "fuel,Fuel1,10,1",
+            "product,Fuel1,Waste1,0.4",
+            "requires,Fuel1,Aux1",
+            "waste,Waste1,1,7",
+            "auxiliary,Aux1,,",
+            "fuel,Fuel2,9.5,2",
+            "product,Fuel1,Fuel2,0.5",
+            "waste,Waste2,1,6",
+            "product,Fuel2,Waste2,0.6",
+        ])
+        self._rs.load_catalogue(path)
+        fuel1 = self._rs.get_material("Fuel1")
+        self.assertEqual("Price 1", fuel1.info)
+        self.assertAlmostEqual(9.5, self._rs.get_material("Fuel2").energy)
+        self.assertEqual("Aux1", fuel1.auxiliary.name)
+        self.assertEqual([("Waste1", 0.4), ("Fuel2", 0.5)], [(prod.name, qt) for prod, qt in fuel1.products])
+        _, energy, disposal = self._rs.simulate_reaction("Fuel1", 10)
+        self.assertAlmostEqual(10*10 + 10*0.5*9.5, energy)
+        self.assertAlmostEqual(10*0.4*7 + 10*0.5*0.6*6, disposal)
+
+    def test_load_json_lines(self):
+        records = [
+            {"kind": "fuel", "name": "Fuel1", "energy": 10, "price": 1},
+            {"kind": "product", "material": "Fuel1", "product": "Waste1", "quantity": 0.4},
+            {"kind": "waste", "name": "Waste1", "energy": 1, "disposal_cost": 7},
+            {"kind": "auxiliary", "name": "Aux1"},
+            {"kind": "requires", "material": "Fuel1", "auxiliary": "Aux1"},
+        ]
+        path = self._write("catalogue.jsonl", [json.dumps(r) for r in records])
+        self._rs.load_catalogue(path)
+        self.assertEqual("Disposal 7", self._rs.get_material("Waste1").info)
+        self.assertEqual("Aux1", self._rs.find_inconsistency("Fuel1", set()))
+        self.assertEqual(1, self._rs.version)
+
+        journaled = ReactorSimulator(journal=True)
+        journaled.load_catalogue(path)
+        self.assertEqual([Change(1, "load_catalogue", (path,))], journaled.changes_since(0))
+
+    def test_load_errors(self):
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("missing.csv", ["fuel,Fuel1,10,1", "product,Fuel1,Waste1,0.4"]))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("unknown.csv", ["isotope,Fuel1,10,1"]))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("number.csv", ["fuel,Fuel1,abc,1"]))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("number.jsonl", ['{"kind": "fuel", "name": "Fuel1", "energy": null, "price": 1}']))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("truncated.jsonl", ['{"kind": "fuel", "name": "Fu']))
+        with self.assertRaisesRegex(ReactorException, "line 2"):
+            self._rs.load_catalogue(self._write("array.jsonl", ['{"kind": "auxiliary", "name": "Aux1"}', '["fuel"]']))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("kind.jsonl", ['{"kind": ["fuel"], "name": "Fuel1", "energy": 1, "price": 1}']))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("name.jsonl", ['{"kind": "fuel", "name": 5, "energy": 1, "price": 1}']))
+        self.assertRaises(ReactorException, self._rs.load_catalogue,
+                          self._write("product.jsonl", ['{"kind": "product", "material": "Fuel1", "product": null, '
+                                                        '"quantity": 1}']))
+
+    def test_load_edges_in_file_order(self):
+        path = self._write("order.csv", [
+            "fuel,Fuel1,10,1",
+            "product,Fuel1,Waste1,0.4",
+            "waste,Waste2,1,6",
+            "product,Fuel1,Waste2,0.6",
+            "auxiliary,Aux1",
+            "requires,Fuel1,Aux2",
+            "requires,Fuel1,Aux1",
+            "waste,Waste1,1,7",
+            "auxiliary,Aux2",
+        ])
+        self._rs.load_catalogue(path)
+        fuel1 = self._rs.get_material("Fuel1")
+        self.assertEqual(["Waste1", "Waste2"], [prod.name for prod, _ in fuel1.products])
+        self.assertEqual("Aux1", fuel1.auxiliary.name)
+        self.assertEqual([("Waste1", 4.0), ("Waste2", 6.0)], self._rs.simulate_reaction("Fuel1", 10)[0])
+
+
+class CountingSimulator(ReactorSimulator):
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def simulate_reaction(self, fuel, quantity):
+        self.calls += 1
+        self.release.wait(5)
+        return super().simulate_reaction(fuel, quantity)
+
+
+class TestAsyncService(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = CountingSimulator()
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_waste("Waste1", 1, 7)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Waste1"), 0.5)
+        self._rs.get_material("Fuel1").set_auxiliary(self._rs.get_material("Aux1"))
+        self._service = AsyncReactorSimulator(self._rs)
+
+    def test_coalescing(self):
+        async def run():
+            queries = [asyncio.ensure_future(self._service.simulate_reaction("Fuel1", 2)) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            self._rs.release.set()
+            return await asyncio.gather(*queries)
+
+        results = asyncio.run(run())
+        self.assertEqual(1, self._rs.calls)
+        self.assertEqual([([("Waste1", 1.0)], 20.0, 7.0)] * 5, results)
+
+    def test_version(self):
+        self._rs.release.set()
+        version = self._rs.version
+        self.assertEqual(([("Waste1", 1.0)], 20.0, 7.0), asyncio.run(self._service.simulate_reaction("Fuel1", 2)))
+        self._rs.add_waste("Waste2", 1, 3)
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Waste2"), 0.5)
+        self.assertEqual(version + 2, self._rs.version)
+        self.assertEqual(([("Waste1", 1.0), ("Waste2", 1.0)], 20.0, 10.0),
+                         asyncio.run(self._service.simulate_reaction("Fuel1", 2)))
+        self.assertEqual(2, self._rs.calls)
+
+    def test_inconsistency(self):
+        self.assertEqual("Aux1", asyncio.run(self._service.find_inconsistency("Fuel1", set())))
+        self.assertIsNone(asyncio.run(self._service.find_inconsistency("Fuel1", {"Aux1"})))
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator(journal=True)
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_fuel("Fuel2", 9, 1)
+        self._rs.add_waste("Waste1", 1, 7)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Waste1"), 0.5)
+        self._rs.get_material("Fuel1").set_auxiliary(self._rs.get_material("Aux1"))
+
+    def test_journal(self):
+        version = self._rs.version
+        self._rs.add_intermediate("Waste1", "Fuel2", (0.3, 0.4))
+        self._rs.get_material("Fuel1").remove_product("Fuel2")
+        self.assertEqual([Change(version + 1, "add_intermediate", ("Waste1", "Fuel2", (0.3, 0.4))),
+                          Change(version + 2, "remove_product", ("Fuel1", "Fuel2"))],
+                         self._rs.changes_since(version))
+        self.assertEqual(Change(6, "set_auxiliary", ("Fuel1", "Aux1")), self._rs.changes_since(5)[0])
+
+    def test_replay(self):
+        replica = ReactorSimulator()
+        replica.replay(self._rs.changes_since(0))
+        version = self._rs.version
+        self._rs.add_intermediate("Waste1", "Fuel2", (0.3, 0.4))
+        replica.replay(self._rs.changes_since(version))
+
+        self.assertEqual(self._rs.version, replica.version)
+        self.assertEqual(self._rs.simulate_reaction("Fuel1", 3), replica.simulate_reaction("Fuel1", 3))
+        self.assertEqual("Aux1", replica.find_inconsistency("Fuel1", set()))
+
+    def test_journal_disabled(self):
+        rs = ReactorSimulator()
+        rs.add_fuel("Fuel1", 10, 1)
+        rs.add_waste("Waste1", 1, 7)
+        rs.get_material("Fuel1").add_product(rs.get_material("Waste1"), 0.5)
+        self.assertEqual(3, rs.version)
+        self.assertRaises(ReactorException, rs.changes_since, 0)
+        self.assertRaises(ReactorException, rs.fork().changes_since, 0)
+        self.assertEqual([], self._rs.fork().changes_since(0))
+
+
+class TestFork(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_fuel("Fuel2", 9, 1)
+        self._rs.add_fuel("Fuel3", 8, 1)
+        self._rs.add_fuel("Fuel4", 7, 1)
+        self._rs.add_waste("Waste1", 1, 7)
+        self._rs.add_waste("Waste2", 1, 6)
+        self._rs.add_waste("Waste3", 1, 5)
+
+        fuel1 = self._rs.get_material("Fuel1")
+        fuel2 = self._rs.get_material("Fuel2")
+        fuel3 = self._rs.get_material("Fuel3")
+        fuel1.add_product(fuel2, 0.5)
+        fuel1.add_product(fuel3, 0.1)
+        fuel2.add_product(self._rs.get_material("Waste1"), 0.6)
+        fuel3.add_product(self._rs.get_material("Waste2"), 0.7)
+        self._expected = self._rs.simulate_reaction("Fuel1", 10)
+
+    def test_fork_intermediate(self):
+        scenario = self._rs.fork()
+        scenario.add_intermediate("Waste1", "Fuel4", (0.3, 0.4))
+
+        residual, energy, _ = scenario.simulate_reaction("Fuel1", 10)
+        self.assertAlmostEqual(10*0.5*0.3*0.4, residual[0][1])
+        self.assertAlmostEqual(10*10 + 10*0.5*9 + 10*0.5*0.3*7 + 10*0.1*8, energy)
+        self.assertEqual(self._expected, self._rs.simulate_reaction("Fuel1", 10))
+        self.assertEqual("Fuel2", self._rs.get_material("Waste1").parent.name)
+        self.assertEqual("Fuel4", scenario.get_material("Waste1").parent.name)
+
+    def test_fork_sharing(self):
+        scenario = self._rs.fork()
+        scenario.get_material("Fuel2").add_product(scenario.get_material("Waste3"), 0)
+        self.assertEqual(self._expected[1:], scenario.simulate_reaction("Fuel1", 10)[1:])
+        self.assertEqual({"Fuel1", "Fuel2", "Waste3"}, set(scenario._materials.maps[0]))
+        products = dict((prod.name, prod) for prod, _ in scenario.get_material("Fuel1").products)
+        self.assertIsNot(self._rs.get_material("Fuel3"), products["Fuel3"])
+        self.assertIsNot(self._rs.get_material("Fuel2"), products["Fuel2"])
+        self.assertEqual(["Waste1"], [prod.name for prod, _ in self._rs.get_material("Fuel2").products])
+
+    def test_fork_change_through_products(self):
+        self._rs.get_material("Fuel3").set_auxiliary(self._rs.get_material("Waste3"))
+        scenario = self._rs.fork()
+        scenario.get_material("Fuel1").products[1][0].set_auxiliary(None)
+        scenario.get_material("Fuel1").products[0][0].products[0][0].add_product(scenario.get_material("Waste3"), 1)
+        self.assertEqual("Waste3", self._rs.get_material("Fuel3").auxiliary.name)
+        self.assertIsNone(scenario.get_material("Fuel3").auxiliary)
+        self.assertEqual(self._expected, self._rs.simulate_reaction("Fuel1", 10))
+        self.assertEqual(["Waste3", "Waste2"], [name for name, _ in scenario.simulate_reaction("Fuel1", 10)[0]])
+
+    def test_fork_remove_shared_product(self):
+        scenario = self._rs.fork()
+        scenario.get_material("Fuel1").remove_product("Fuel3")
+        self.assertEqual(["Fuel1"], [mat.name for mat in self._rs.get_material("Fuel3").parents])
+        self.assertEqual(self._expected, self._rs.simulate_reaction("Fuel1", 10))
+        self._rs.add_intermediate("Fuel3", "Fuel4", (0.5, 1))
+        self.assertEqual(["Fuel2", "Fuel4"], [prod.name for prod, _ in self._rs.get_material("Fuel1").products])
+        self.assertEqual(["Fuel2"], [prod.name for prod, _ in scenario.get_material("Fuel1").products])
+
+    def test_fork_then_change_base(self):
+        scenario = self._rs.fork()
+        fuel2 = scenario.get_material("Fuel2")
+        fuel2.add_product(fuel2.products[0][0], 0.9)
+        expected = scenario.simulate_reaction("Fuel1", 10)
+        self.assertEqual([self._rs.get_material("Fuel2")], self._rs.get_material("Waste1").parents)
+        self._rs.add_intermediate("Waste1", "Fuel4", (0.3, 0.4))
+        self.assertEqual([("Waste1", 0.9)], [(prod.name, qt) for prod, qt in scenario.get_material("Fuel2").products])
+        self.assertEqual(expected, scenario.simulate_reaction("Fuel1", 10))
+        self.assertEqual(["Fuel4"], [prod.name for prod, _ in self._rs.get_material("Fuel2").products])
+
+    def test_fork_journal(self):
+        version = self._rs.version
+        scenario = self._rs.fork()
+        scenario.add_intermediate("Waste2", "Fuel4", (0.3, 0.4))
+        self.assertEqual(version, self._rs.version)
+        self.assertEqual(1, scenario.version)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_fuel("Fuel2", 9, 1)
+        self._rs.add_waste("Waste1", 1, 7)
+        self._rs.add_waste("Waste2", 1, 6)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.add_auxiliary("Aux2")
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Fuel2"), 0.5)
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Waste1"), 0.5)
+        self._rs.get_material("Fuel2").add_product(self._rs.get_material("Waste2"), 0.5)
+        self._rs.get_material("Fuel1").set_auxiliary(self._rs.get_material("Aux1"))
+        self._rs.get_material("Fuel2").set_auxiliary(self._rs.get_material("Aux2"))
+
+    def test_metrics(self):
+        with Instrumentation() as metrics:
+            self._rs.simulate_reaction("Fuel1", 2)
+            self._rs.simulate_reaction(fuel="Fuel1", quantity=3)
+            self.assertEqual("Aux2", self._rs.find_inconsistency("Fuel1", {"Aux1"}))
+
+        data = metrics.as_dict()
+        self.assertEqual(4, data["counters"]["yield_nodes"])
+        self.assertEqual(2, data["counters"]["inconsistency_checks"])
+        self.assertEqual(2, data["timers"]["simulate_reaction"]["count"])
+        self.assertEqual(2, sum(data["histograms"]["simulate_reaction"]["Fuel1"]["buckets"].values()))
+        self.assertIn('reactor_latency_seconds_count{operation="simulate_reaction",fuel="Fuel1"} 2',
+                      metrics.to_prometheus())
+
+    def test_id_queries(self):
+        fuel = self._rs.material_id("Fuel1")
+        with Instrumentation() as metrics:
+            self._rs.simulate_reaction_by_id(fuel=fuel, quantity=2)
+            self._rs.find_inconsistency_by_id(fuel, {self._rs.material_id("Aux1"), self._rs.material_id("Aux2")})
+            self._rs.add_intermediate_by_id(self._rs.material_id("Waste2"), self._rs.material_id("Fuel2"), (1, 1))
+        self.assertEqual(1, metrics.timers["simulate_reaction"][0])
+        self.assertEqual(1, metrics.timers["find_inconsistency"][0])
+        self.assertEqual(1, metrics.timers["add_intermediate"][0])
+        self.assertEqual(2, metrics.counters["inconsistency_checks"])
+        self.assertEqual({("simulate_reaction", "Fuel1"), ("find_inconsistency", "Fuel1")}, set(metrics.histograms))
+
+    def test_single_simulator(self):
+        other = ReactorSimulator()
+        other.add_fuel("Fuel1", 1, 1)
+        other.add_waste("Waste1", 1, 1)
+        other.get_material("Fuel1").add_product(other.get_material("Waste1"), 1)
+        simulate = ReactorSimulator.__dict__["simulate_reaction_by_id"]
+        with Instrumentation(self._rs) as metrics:
+            self.assertIs(simulate, ReactorSimulator.__dict__["simulate_reaction_by_id"])
+            other.simulate_reaction("Fuel1", 1)
+            self._rs.simulate_reaction("Fuel2", 1)
+        self.assertEqual(1, metrics.timers["simulate_reaction"][0])
+        self.assertEqual(2, metrics.counters["yield_nodes"])
+        self.assertNotIn("simulate_reaction_by_id", vars(self._rs))
+
+    def test_disabled(self):
+        simulate = ReactorSimulator.__dict__["simulate_reaction_by_id"]
+        combine = NuclearMaterial.__dict__["_combine_yields"]
+        metrics = Instrumentation().enable()
+        self.assertIsNot(simulate, ReactorSimulator.__dict__["simulate_reaction_by_id"])
+        self.assertRaises(ReactorException, Instrumentation().enable)
+        metrics.disable()
+        self.assertIs(simulate, ReactorSimulator.__dict__["simulate_reaction_by_id"])
+        self.assertIs(combine, NuclearMaterial.__dict__["_combine_yields"])
+        self._rs.simulate_reaction("Fuel1", 2)
+        self.assertEqual({}, metrics.timers)
+
+
+class TestSharedProducts(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        for i, energy in enumerate([10, 9, 8, 7], 1):
+            self._rs.add_fuel("Fuel{}".format(i), energy, 1)
+        self._rs.add_waste("Waste1", 1, 5)
+        self._rs.add_waste("Waste2", 1, 3)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.add_auxiliary("Aux2")
+        self._fuel = [self._rs.get_material("Fuel{}".format(i)) for i in range(1, 5)]
+
+        # --- STRUCTURE ---
+        # fuel1 -> fuel2 -> waste1
+        #                -> fuel4 (aux2) -> waste2
+        #       -> fuel3 (aux1) -> fuel4
+        self._fuel[0].add_product(self._fuel[1], 0.5)
+        self._fuel[0].add_product(self._fuel[2], 0.5)
+        self._fuel[1].add_product(self._rs.get_material("Waste1"), 0.4)
+        self._fuel[1].add_product(self._fuel[3], 0.6)
+        self._fuel[2].add_product(self._fuel[3], 1)
+        self._fuel[3].add_product(self._rs.get_material("Waste2"), 1)
+        self._fuel[2].set_auxiliary(self._rs.get_material("Aux1"))
+        self._fuel[3].set_auxiliary(self._rs.get_material("Aux2"))
+
+    def test_shared_simulation(self):
+        residual, energy, disposal = self._rs.simulate_reaction("Fuel1", 10)
+        self.assertEqual(["Waste1", "Waste2"], [name for name, _ in residual])
+        self.assertAlmostEqual(10*0.5*0.4, residual[0][1])
+        self.assertAlmostEqual(10*(0.5*0.6 + 0.5), residual[1][1])
+        self.assertAlmostEqual(10*10 + 5*9 + 5*8 + 8*7, energy)
+        self.assertAlmostEqual(2*5 + 8*3, disposal)
+
+        compiled = self._rs.compile().simulate_reaction("Fuel1", 10)
+        self.assertEqual([name for name, _ in residual], [name for name, _ in compiled[0]])
+        self.assertAlmostEqual(energy, compiled[1])
+        self.assertAlmostEqual(disposal, compiled[2])
+
+    def test_shared_parents(self):
+        self.assertEqual(["Fuel2", "Fuel3"], [parent.name for parent in self._fuel[3].parents])
+        self._rs.add_fuel("Fuel5", 6, 1)
+        self._rs.add_intermediate("Fuel4", "Fuel5", (0.2, 0.9))
+        self.assertEqual(["Fuel5"], [parent.name for parent in self._fuel[3].parents])
+        self.assertEqual(["Fuel2", "Fuel3"], [parent.name for parent in self._rs.get_material("Fuel5").parents])
+        _, _, disposal = self._rs.simulate_reaction("Fuel1", 10)
+        self.assertAlmostEqual(2*5 + 10*(0.5*0.2 + 0.5*0.2)*0.9*3, disposal)
+
+    def test_shared_inconsistency(self):
+        compiled = self._rs.compile()
+        for auxiliary in [set(), {"Aux1"}, {"Aux2"}, {"Aux1", "Aux2"}]:
+            self.assertEqual(self._rs.find_inconsistency("Fuel1", auxiliary),
+                             compiled.find_inconsistency("Fuel1", auxiliary))
+        self.assertEqual("Aux2", self._rs.find_inconsistency("Fuel1", {"Aux1"}))
+
+    def test_cycle(self):
+        self._fuel[3].add_product(self._fuel[0], 0.1)
+        self.assertRaises(ReactorException, self._rs.simulate_reaction, "Fuel1", 10)
+        self.assertRaises(ReactorException, self._rs.compile().simulate_reaction, "Fuel1", 10)
+        self._fuel[3].remove_product("Fuel1")
+        self.assertEqual(2, len(self._rs.simulate_reaction("Fuel1", 10)[0]))
+
+    def test_exponential_paths(self):
+        # every material of a level produces both materials of the next level: 2^60 paths
+        for level in range(60):
+            for side in range(2):
+                self._rs.add_fuel("Level{}_{}".format(level, side), 1, 1)
+        for level in range(59):
+            for side in range(2):
+                for other in range(2):
+                    self._rs.get_material("Level{}_{}".format(level, side)).add_product(
+                        self._rs.get_material("Level{}_{}".format(level + 1, other)), 0.5)
+        for side in range(2):
+            self._rs.get_material("Level59_{}".format(side)).add_product(self._rs.get_material("Waste1"), 1)
+        residual, energy, _ = self._rs.simulate_reaction("Level0_0", 1)
+        self.assertEqual(1, len(residual))
+        self.assertAlmostEqual(1, residual[0][1])
+        self.assertAlmostEqual(60, energy)
+        self.assertAlmostEqual(60, self._rs.compile().simulate_reaction("Level0_0", 1)[1])
+        self.assertAlmostEqual(1, self._rs.sensitivities("Level0_0", 1).disposal["Waste1"])
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        for i in range(1, 6):
+            self._rs.add_fuel("Fuel{}".format(i), 1, 1)
+        self._rs.add_waste("Waste1", 1, 1)
+        self._rs.add_waste("Waste2", 1, 1)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.add_auxiliary("Aux2")
+        self._fuel = [self._rs.get_material("Fuel{}".format(i)) for i in range(1, 6)]
+        self._fuel[0].add_product(self._fuel[1], 0.5)
+        self._fuel[0].add_product(self._rs.get_material("Waste1"), 0.5)
+        self._fuel[1].add_product(self._rs.get_material("Waste2"), 1)
+        self._fuel[0].set_auxiliary(self._rs.get_material("Aux1"))
+        self._fuel[1].set_auxiliary(self._rs.get_material("Aux2"))
+
+    def test_valid(self):
+        report = self._rs.validate()
+        self.assertEqual(["Fuel3", "Fuel4", "Fuel5"], report.non_waste_leaves)
+        for name in ["Fuel3", "Fuel4", "Fuel5"]:
+            self._rs.get_material(name).add_product(self._rs.get_material("Waste2"), 1)
+        self._rs.get_material("Fuel2").remove_product("Waste2")
+        self._rs.get_material("Fuel2").add_product(self._rs.get_material("Fuel3"), 1)
+        report = self._rs.validate()
+        self.assertTrue(report.valid)
+        self.assertEqual(["Waste2"], report.shared)
+        self.assertEqual({"Fuel1": ["Aux2"], "Fuel2": ["Aux2"]}, self._rs.validate({"Aux1"}).missing_auxiliaries)
+
+    def test_problems(self):
+        self._fuel[2].add_product(self._fuel[3], 1)
+        self._fuel[3].add_product(self._fuel[2], 1)
+        self._fuel[2].set_auxiliary(self._rs.get_material("Aux1"))
+        self._fuel[1].add_product(self._rs.get_material("Waste1"), 0.1)
+        self._fuel[0].add_product(self._rs.get_material("Aux2"), 0.1)
+
+        report = self._rs.validate({"Aux2"})
+        self.assertFalse(report.valid)
+        self.assertEqual([["Fuel3", "Fuel4"]], report.cycles)
+        self.assertEqual(["Waste1"], report.shared)
+        self.assertEqual(["Aux2", "Fuel5"], sorted(report.non_waste_leaves))
+        self.assertEqual({"Fuel1": ["Aux1"]}, report.missing_auxiliaries)
+
+
+class TestMaterialIds(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rs = ReactorSimulator()
+        self._rs.add_fuel("Fuel1", 10, 1)
+        self._rs.add_fuel("Fuel2", 5, 1)
+        self._rs.add_waste("Waste1", 0, 2)
+        self._rs.add_auxiliary("Aux1")
+        self._rs.add_auxiliary("Aux2")
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Fuel2"), 0.5)
+        self._rs.get_material("Fuel1").add_product(self._rs.get_material("Waste1"), 0.5)
+        self._rs.get_material("Fuel2").add_product(self._rs.get_material("Waste1"), 1)
+        self._rs.get_material("Fuel1").set_auxiliary(self._rs.get_material("Aux1"))
+        self._rs.get_material("Fuel2").set_auxiliary(self._rs.get_material("Aux2"))
+
+    def test_dense_ids(self):
+        names = ["Fuel1", "Fuel2", "Waste1", "Aux1", "Aux2"]
+        self.assertEqual(list(range(5)), [self._rs.material_id(name) for name in names])
+        self.assertEqual(2, self._rs.get_material("Waste1").id)
+        self.assertEqual("Aux2", self._rs.get_material_by_id(4).name)
+        self._rs.add_fuel("Fuel1", 1, 1)
+        self.assertEqual(0, self._rs.get_material("Fuel1").id)
+        self.assertEqual(-1, Fuel("Fuel3", 1, 1).id)
+
+    def test_same_results_as_names(self):
+        fuel = self._rs.material_id("Fuel1")
+        aux = self._rs.material_id("Aux1")
+        self.assertEqual(self._rs.simulate_reaction("Fuel1", 10), self._rs.simulate_reaction_by_id(fuel, 10))
+        self.assertEqual("Aux2", self._rs.find_inconsistency("Fuel1", {"Aux1"}))
+        self.assertEqual("Aux1", self._rs.find_inconsistency("Fuel1", {"Aux2", "Aux3"}))
+        self.assertIsNone(self._rs.find_inconsistency("Fuel1", {"Aux2", "Aux1", "Aux3"}))
+        self.assertEqual(self._rs.material_id("Aux2"), self._rs.find_inconsistency_by_id(fuel, {aux}))
+        self.assertIsNone(self._rs.find_inconsistency_by_id(fuel, {aux, self._rs.material_id("Aux2")}))
+
+    def test_foreign_auxiliaries(self):
+        # an unregistered auxiliary has id -1, one of another simulator an id colliding with Fuel1
+        other = ReactorSimulator()
+        other.add_auxiliary("Aux3")
+        self._rs.get_material("Fuel2").set_auxiliary(other.get_material("Aux3"))
+        self._rs.add_fuel("Fuel3", 1, 1)
+        self._rs.get_material("Fuel3").add_product(self._rs.get_material("Waste1"), 1)
+        self._rs.get_material("Fuel3").set_auxiliary(Auxiliary("Aux4"))
+        fuel1 = self._rs.material_id("Fuel1")
+        self.assertEqual("Aux3", self._rs.find_inconsistency("Fuel1", {"Aux1", "Fuel1"}))
+        self.assertEqual(["Aux3"], self._rs.find_all_inconsistencies("Fuel1", {"Aux1", "Fuel1"}))
+        self.assertIsNone(self._rs.find_inconsistency("Fuel1", {"Aux1", "Aux3"}))
+        self.assertEqual(-1, self._rs.find_inconsistency_by_id(fuel1, {fuel1, self._rs.material_id("Aux1")}))
+        self.assertEqual("Aux4", self._rs.find_inconsistency("Fuel3", {"Aux1"}))
+        self.assertIsNone(self._rs.find_inconsistency("Fuel3", {"Aux4"}))
+        self._rs.add_auxiliary("Aux4")
+        self.assertEqual(self._rs.material_id("Aux4"),
+                         self._rs.find_inconsistency_by_id(self._rs.material_id("Fuel3"), set()))
+
+    def test_add_intermediate_by_id(self):
+        self._rs.add_fuel("Fuel3", 1, 1)
+        ids = [self._rs.material_id(name) for name in ["Waste1", "Fuel3"]]
+        version = self._rs.version
+        self._rs.add_intermediate_by_id(ids[0], ids[1], (1, 1))
+        self.assertEqual(["Fuel1", "Fuel2"], [mat.name for mat in self._rs.get_material("Fuel3").parents])
+        self.assertEqual(["Fuel2", "Fuel3"], [prod.name for prod, _ in self._rs.get_material("Fuel1").products])
+        self.assertEqual(["Fuel3"], [mat.name for mat in self._rs.get_material("Waste1").parents])
+        self.assertEqual(version + 1, self._rs.version)
+
+    def test_fork(self):
+        scenario = self._rs.fork()
+        scenario.add_fuel("Fuel3", 1, 1)
+        scenario.get_material("Fuel3").add_product(scenario.get_material_by_id(2), 1)
+        fuel2 = scenario.get_material_by_id(1)
+        fuel2.add_product(scenario.get_material("Fuel3"), 1)
+        self.assertEqual(5, scenario.material_id("Fuel3"))
+        self.assertIs(fuel2, scenario.get_material_by_id(1))
+        self.assertIsNot(fuel2, self._rs.get_material_by_id(1))
+        self.assertRaises(KeyError, self._rs.material_id, "Fuel3")
+        self.assertEqual(self._rs.simulate_reaction("Fuel1", 1)[1] + 0.5,
+                         scenario.simulate_reaction_by_id(0, 1)[1])